@@ -1,7 +1,28 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
-from decision_making import ActionType, Decision
+from typing import Dict, Any, List, Optional, Sequence, Union
+from decision_making import ActionType, Decision, DecisionContext
+from expression import evaluate, evaluate_batch
+from cache import ResponseCache
+from pipeline import consume_exception
+from telemetry import metrics
 import asyncio
+import hashlib
+import json
+import os
+
+# Per-handler timeout in seconds; 0 disables it
+DEFAULT_ACTION_TIMEOUT = float(os.getenv("ACTION_TIMEOUT", "10"))
+# How many of the best-scored decisions to run per turn, and how to pick one
+DEFAULT_TOP_K = int(os.getenv("ACTION_TOP_K", "1"))
+DEFAULT_STRATEGY = os.getenv("ACTION_STRATEGY", "best_score")
+# Results of idempotent actions; ACTION_CACHE_SIZE=0 disables the cache
+DEFAULT_ACTION_CACHE_SIZE = int(os.getenv("ACTION_CACHE_SIZE", "1024"))
+DEFAULT_ACTION_CACHE_TTL = float(os.getenv("ACTION_CACHE_TTL", "300"))
+
+# Actions whose output depends only on their parameters
+IDEMPOTENT_ACTIONS = frozenset({ActionType.SEARCH, ActionType.CALCULATE})
+
+STRATEGIES = ("best_score", "first_success")
 
 class ActionResult(BaseModel):
     """Model for action execution result"""
@@ -10,9 +31,18 @@ class ActionResult(BaseModel):
     error: Optional[str] = None
     execution_time: float = Field(ge=0.0)
     model: str = "gemini-2.0-flash"
+    action_type: Optional[ActionType] = None
+    cached: bool = False
 
 class ActionLayer:
-    def __init__(self):
+    def __init__(self,
+                 timeout: Optional[float] = DEFAULT_ACTION_TIMEOUT,
+                 cache: Optional[ResponseCache] = None,
+                 cache_size: int = DEFAULT_ACTION_CACHE_SIZE):
+        self.timeout = timeout or None
+        if cache is None and cache_size > 0:
+            cache = ResponseCache(max_entries=cache_size, ttl=DEFAULT_ACTION_CACHE_TTL)
+        self.cache = cache
         self.action_handlers = {
             ActionType.RESPOND: self._handle_respond,
             ActionType.SEARCH: self._handle_search,
@@ -23,24 +53,64 @@ class ActionLayer:
         }
         self.model = "gemini-2.0-flash"
 
-    async def execute_action(self, decision: Decision) -> ActionResult:
-        """Execute a decision and return the result"""
+    def _cache_key(self, decision: Decision) -> Optional[str]:
+        """Key for an idempotent decision, or None if its result must not be cached"""
+        if self.cache is None or decision.action_type not in IDEMPOTENT_ACTIONS:
+            return None
+        # These handlers never read the decision context, so it is left out
+        parameters = {k: v for k, v in decision.parameters.items() if k != "context"}
+        payload = json.dumps(
+            {"action": decision.action_type.value, "parameters": parameters},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def execute_action(self, decision: Decision, timeout: Optional[float] = None) -> ActionResult:
+        """Execute a decision and return the result.
+
+        The handler is cancelled after ``timeout`` seconds (the layer default
+        when omitted). Successful results of idempotent actions are cached.
+        """
         start_time = asyncio.get_event_loop().time()
-        
+        timeout = timeout or self.timeout
+        key = self._cache_key(decision)
+
         try:
             if decision.action_type not in self.action_handlers:
                 raise ValueError(f"Unknown action type: {decision.action_type}")
 
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    metrics.inc("action_cache_hits_total", labels={"action": decision.action_type.value})
+                    return ActionResult(
+                        success=True,
+                        output=cached["output"],
+                        execution_time=asyncio.get_event_loop().time() - start_time,
+                        model=self.model,
+                        action_type=decision.action_type,
+                        cached=True
+                    )
+
             handler = self.action_handlers[decision.action_type]
-            output = await handler(decision.parameters)
-            
+            try:
+                output = await asyncio.wait_for(handler(decision.parameters), timeout)
+            except asyncio.TimeoutError:
+                metrics.inc("action_timeouts_total", labels={"action": decision.action_type.value})
+                raise TimeoutError(f"Action {decision.action_type.value} timed out after {timeout}s")
+
+            if key is not None:
+                self.cache.set(key, {"output": output})
+
             execution_time = asyncio.get_event_loop().time() - start_time
             
             return ActionResult(
                 success=True,
                 output=output,
                 execution_time=execution_time,
-                model=self.model
+                model=self.model,
+                action_type=decision.action_type
             )
             
         except Exception as e:
@@ -50,14 +120,61 @@ class ActionLayer:
                 output=None,
                 error=str(e),
                 execution_time=execution_time,
-                model=self.model
+                model=self.model,
+                action_type=decision.action_type
             )
 
+    async def execute_top_k(self,
+                            decisions: Sequence[Decision],
+                            k: int = DEFAULT_TOP_K,
+                            strategy: str = DEFAULT_STRATEGY,
+                            timeout: Optional[float] = None) -> ActionResult:
+        """Run the k most confident decisions concurrently and return one result.
+
+        "best_score" returns the most confident decision that succeeds, as
+        soon as every more confident one has failed. "first_success" returns
+        whichever succeeds first. Handlers still running are cancelled. If
+        all fail, the most confident decision's failure is returned.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        ranked = sorted(decisions, key=lambda d: d.confidence, reverse=True)[:max(1, k)]
+        if len(ranked) == 1:
+            return await self.execute_action(ranked[0], timeout)
+
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(self.execute_action(d, timeout), name=f"action:{d.action_type.value}") for d in ranked]
+        rank = {task: i for i, task in enumerate(tasks)}
+        results: List[Optional[ActionResult]] = [None] * len(tasks)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[rank[task]] = task.result()
+                if strategy == "first_success":
+                    winners = [r for r in results if r is not None and r.success]
+                    if winners:
+                        return winners[0]
+                else:
+                    # Finished once the best remaining candidate has an answer
+                    for result in results:
+                        if result is None:
+                            break
+                        if result.success:
+                            return result
+            return results[0]
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(consume_exception)
+
     async def _handle_respond(self, parameters: Dict[str, Any]) -> str:
         """Handle respond action"""
         context = parameters.get("context", {})
         model = parameters.get("model", "gemini-2.0-flash")
-        return f"[{model}] Responding to context: {context}"
+        summary = context.summary() if isinstance(context, DecisionContext) else context
+        return f"[{model}] Responding to context: {summary}"
 
     async def _handle_search(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Handle search action"""
@@ -65,12 +182,17 @@ class ActionLayer:
         model = parameters.get("model", "gemini-2.0-flash")
         return {"results": f"[{model}] Search results for: {query}"}
 
-    async def _handle_calculate(self, parameters: Dict[str, Any]) -> float:
-        """Handle calculate action"""
+    async def _handle_calculate(self, parameters: Dict[str, Any]) -> Union[float, List[float]]:
+        """Handle calculate action.
+
+        Expressions are evaluated by the whitelisted, cached evaluator in
+        expression.py. Pass "variables" for scalar bindings, or "bindings"
+        (name -> list of values) to evaluate over arrays in one batch.
+        """
         expression = parameters.get("expression", "0")
-        model = parameters.get("model", "gemini-2.0-flash")
-        result = eval(expression)  # In production, use a safer evaluation method
-        return float(f"[{model}] {result}")
+        if "bindings" in parameters:
+            return evaluate_batch(expression, parameters["bindings"]).tolist()
+        return float(evaluate(expression, parameters.get("variables")))
 
     async def _handle_create(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Handle create action"""
@@ -1,10 +1,16 @@
 import streamlit as st
 import asyncio
-import plotly.graph_objects as go
-import pandas as pd
+import html
+import threading
+from collections import deque
 from main import CognitiveAgent, UserPreferences
+from perception import PerceptionLayer, get_shared_model
 from datetime import datetime
 
+# Messages rendered per page of chat history, and points kept for analytics
+HISTORY_PAGE_SIZE = 20
+ANALYTICS_WINDOW = 500
+
 # Set page config
 st.set_page_config(
     page_title="Cognitive Agent Interface",
@@ -43,6 +49,30 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """One event loop per server, running in a daemon thread and shared by every session"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+    return loop
+
+@st.cache_resource
+def get_model():
+    """Gemini client shared by every session's perception layer"""
+    return get_shared_model("gemini-2.0-flash")
+
+def run_async(coro):
+    """Run a coroutine on the shared loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+def new_analytics():
+    return {
+        "time": deque(maxlen=ANALYTICS_WINDOW),
+        "confidence": deque(maxlen=ANALYTICS_WINDOW),
+        "execution_time": deque(maxlen=ANALYTICS_WINDOW),
+        "model_used": None,
+    }
+
 # Initialize session state
 if 'agent' not in st.session_state:
     st.session_state.agent = None
@@ -50,6 +80,10 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'preferences_set' not in st.session_state:
     st.session_state.preferences_set = False
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = 1
+if 'analytics' not in st.session_state:
+    st.session_state.analytics = new_analytics()
 
 def display_confidence_meter(confidence):
     """Display a confidence meter"""
@@ -66,7 +100,41 @@ def display_reasoning_chain(chain):
         for i, step in enumerate(chain, 1):
             st.markdown(f"**Step {i}:** {step}")
 
-def display_chat_message(role, content, confidence=None, reasoning=None):
+def iterate_async(async_gen):
+    """Drive an async generator on the shared loop from synchronous Streamlit code"""
+    try:
+        while True:
+            try:
+                yield run_async(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        run_async(async_gen.aclose())
+
+def stream_agent_response(agent, prompt):
+    """Render perception chunks as they arrive and return the final AgentResponse"""
+    placeholder = st.empty()
+    streamed_text = ""
+    response = None
+    for item in iterate_async(agent.process_stream(prompt)):
+        if isinstance(item, str):
+            streamed_text += item
+            with placeholder.container():
+                with st.chat_message("assistant"):
+                    st.markdown(streamed_text + "▌")
+        else:
+            response = item
+    placeholder.empty()
+    return response
+
+def render_reasoning(reasoning):
+    """Reasoning steps as one HTML block, built once when the message is stored"""
+    return "".join(
+        f'<div style="padding: 5px 0;"><strong>Step {i}:</strong> {html.escape(step)}</div>'
+        for i, step in enumerate(reasoning, 1)
+    )
+
+def display_chat_message(role, content, confidence=None, reasoning=None, reasoning_html=None):
     """Display a chat message with optional confidence and reasoning"""
     with st.chat_message(role):
         # Main content
@@ -82,12 +150,69 @@ def display_chat_message(role, content, confidence=None, reasoning=None):
             st.markdown("---")
             st.markdown("### Reasoning Process")
             with st.expander("View Detailed Reasoning", expanded=False):
-                for i, step in enumerate(reasoning, 1):
-                    st.markdown(f"""
-                    <div style="padding: 5px 0;">
-                        <strong>Step {i}:</strong> {step}
-                    </div>
-                    """, unsafe_allow_html=True)
+                # A single element, however many steps there are
+                st.markdown(reasoning_html or render_reasoning(reasoning), unsafe_allow_html=True)
+
+def display_history():
+    """Render the most recent pages of chat history; older pages load on demand"""
+    history = st.session_state.chat_history
+    shown = st.session_state.history_pages * HISTORY_PAGE_SIZE
+    hidden = len(history) - shown
+    if hidden > 0:
+        if st.button(f"Show earlier messages ({hidden} hidden)"):
+            st.session_state.history_pages += 1
+            st.rerun()
+    for message in history[max(0, hidden):]:
+        display_chat_message(
+            message["role"],
+            message["content"],
+            message.get("confidence"),
+            message.get("reasoning"),
+            message.get("reasoning_html")
+        )
+
+def record_analytics(response):
+    """Append one point to the rolling analytics series"""
+    analytics = st.session_state.analytics
+    analytics["time"].append(datetime.now())
+    analytics["confidence"].append(response.confidence)
+    analytics["execution_time"].append(response.execution_time)
+    analytics["model_used"] = response.model_used
+
+def display_analytics():
+    """Metrics and confidence trend from the rolling series"""
+    analytics = st.session_state.analytics
+    if not analytics["time"]:
+        return
+    st.markdown("---")
+    st.markdown("### Response Analytics")
+
+    # Create two columns for metrics
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Response Time", f"{analytics['execution_time'][-1]:.2f}s")
+    with col2:
+        st.metric("Model Used", analytics["model_used"])
+
+    # Confidence over time visualization; plotly is only imported once there is data
+    import plotly.graph_objects as go
+    st.markdown("#### Confidence Trend")
+    fig = go.Figure(data=go.Scatter(
+        x=list(analytics["time"]),
+        y=list(analytics["confidence"]),
+        mode='lines+markers',
+        line=dict(color='#4CAF50', width=2),
+        marker=dict(size=8, color='#4CAF50')
+    ))
+    fig.update_layout(
+        title="Confidence Over Time",
+        xaxis_title="Time",
+        yaxis_title="Confidence",
+        yaxis_range=[0, 1],
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 def main():
     st.title("🤖 Cognitive Agent Interface")
@@ -112,9 +237,9 @@ def main():
                             favorite_topics=[topic.strip() for topic in favorite_topics.split(",")]
                         )
                         
-                        # Initialize agent with preferences
-                        st.session_state.agent = CognitiveAgent()
-                        asyncio.run(st.session_state.agent.set_user_preferences(preferences))
+                        # Initialize agent with preferences, reusing the shared Gemini client
+                        st.session_state.agent = CognitiveAgent(perception=PerceptionLayer(model=get_model()))
+                        run_async(st.session_state.agent.set_user_preferences(preferences))
                         st.session_state.preferences_set = True
                         st.success("Preferences set successfully!")
                     else:
@@ -125,18 +250,14 @@ def main():
                 st.session_state.preferences_set = False
                 st.session_state.agent = None
                 st.session_state.chat_history = []
+                st.session_state.history_pages = 1
+                st.session_state.analytics = new_analytics()
                 st.rerun()
 
     # Main chat interface
     if st.session_state.preferences_set:
         # Display chat history
-        for message in st.session_state.chat_history:
-            display_chat_message(
-                message["role"],
-                message["content"],
-                message.get("confidence"),
-                message.get("reasoning")
-            )
+        display_history()
 
         # Chat input
         if prompt := st.chat_input("Type your message here..."):
@@ -144,58 +265,31 @@ def main():
             st.session_state.chat_history.append({"role": "user", "content": prompt})
             display_chat_message("user", prompt)
 
-            # Get agent response
-            response = asyncio.run(st.session_state.agent.process(prompt))
+            # Get agent response, streaming perception output as it is generated
+            response = stream_agent_response(st.session_state.agent, prompt)
+            reasoning_html = render_reasoning(response.reasoning_chain)
             
             # Add agent response to chat
             st.session_state.chat_history.append({
                 "role": "assistant",
                 "content": response.output,
                 "confidence": response.confidence,
-                "reasoning": response.reasoning_chain
+                "reasoning": response.reasoning_chain,
+                "reasoning_html": reasoning_html
             })
+            record_analytics(response)
             
             # Display agent response
             display_chat_message(
                 "assistant",
                 response.output,
                 response.confidence,
-                response.reasoning_chain
+                response.reasoning_chain,
+                reasoning_html
             )
 
-            # Analytics section
-            st.markdown("---")
-            st.markdown("### Response Analytics")
-            
-            # Create two columns for metrics
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Response Time", f"{response.execution_time:.2f}s")
-            with col2:
-                st.metric("Model Used", response.model_used)
-
-            # Confidence over time visualization
-            st.markdown("#### Confidence Trend")
-            confidence_data = pd.DataFrame({
-                'Time': [datetime.now()],
-                'Confidence': [response.confidence]
-            })
-            fig = go.Figure(data=go.Scatter(
-                x=confidence_data['Time'],
-                y=confidence_data['Confidence'],
-                mode='lines+markers',
-                line=dict(color='#4CAF50', width=2),
-                marker=dict(size=8, color='#4CAF50')
-            ))
-            fig.update_layout(
-                title="Confidence Over Time",
-                xaxis_title="Time",
-                yaxis_title="Confidence",
-                yaxis_range=[0, 1],
-                plot_bgcolor='white',
-                paper_bgcolor='white'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Analytics section
+        display_analytics()
     else:
         st.info("Please set your preferences in the sidebar to start chatting!")
 
@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from main import CognitiveAgent
+from perception import UserPreferences
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def read_completed(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """Ids already written to the output file.
+
+    The output doubles as the checkpoint: every finished record is appended
+    and flushed. A torn last line from an interrupted run is ignored here
+    and dropped by drop_torn_line before the next run appends.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("ok") or not retry_failed:
+                completed.add(str(record["id"]))
+    return completed
+
+def drop_torn_line(output_path: str) -> None:
+    """Truncate a partial last line left by an interrupted run, so appends start on a fresh line"""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back in blocks to the last complete line
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+def iter_records(input_path: str,
+                 id_field: str,
+                 input_field: str) -> Iterator[Tuple[str, Optional[str], Dict[str, Any], Optional[str]]]:
+    """Stream (id, input text, record, error) from a JSONL file.
+
+    Malformed lines are yielded with an error instead of raising, so one bad
+    record does not stop the run; their id falls back to the line number.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield str(line_number), None, {}, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield str(line_number), None, {}, "Record is not a JSON object"
+                continue
+            record_id = str(record.get(id_field, line_number))
+            if input_field not in record:
+                yield record_id, None, record, f"Missing field: {input_field}"
+                continue
+            yield record_id, record[input_field], record, None
+
+class BatchRunner:
+    """Runs CognitiveAgent.process over a JSONL file with a bounded concurrency window"""
+
+    def __init__(self,
+                 concurrency: int = 8,
+                 preferences: Optional[UserPreferences] = None,
+                 id_field: str = "id",
+                 input_field: str = "input",
+                 retry_failed: bool = False):
+        self.concurrency = concurrency
+        self.preferences = preferences or UserPreferences()
+        self.id_field = id_field
+        self.input_field = input_field
+        self.retry_failed = retry_failed
+        self.latencies: List[float] = []
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+
+    async def _run_one(self, record_id: str, input_text: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        # Each record gets its own session so results don't depend on order
+        start = time.perf_counter()
+        try:
+            agent = CognitiveAgent()
+            preferences = self.preferences
+            if "preferences" in record:
+                preferences = UserPreferences(**record["preferences"])
+            await agent.set_user_preferences(preferences)
+            response = await agent.process(input_text)
+            result = {"id": record_id, "ok": True, "response": response.model_dump(mode="json")}
+        except Exception as e:
+            result = {"id": record_id, "ok": False, "error": str(e)}
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    async def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Process every record not already in the output; return summary stats"""
+        drop_torn_line(output_path)
+        completed = read_completed(output_path, self.retry_failed)
+        start = time.perf_counter()
+        in_flight: Set[asyncio.Task] = set()
+
+        with open(output_path, "a", encoding="utf-8") as out:
+            def write(result: Dict[str, Any]) -> None:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                if "latency" in result:
+                    self.latencies.append(result["latency"])
+                if result["ok"]:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+
+            records = iter_records(input_path, self.id_field, self.input_field)
+            for record_id, input_text, record, error in records:
+                if record_id in completed:
+                    self.skipped += 1
+                    continue
+                if error is not None:
+                    # Never reached the agent, so it has no latency
+                    write({"id": record_id, "ok": False, "error": error})
+                    continue
+                if len(in_flight) >= self.concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        write(task.result())
+                in_flight.add(asyncio.ensure_future(self._run_one(record_id, input_text, record)))
+
+            if in_flight:
+                done, _ = await asyncio.wait(in_flight)
+                for task in done:
+                    write(task.result())
+
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        processed = self.succeeded + self.failed
+        return {
+            "processed": processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_s": elapsed,
+            "throughput_per_s": processed / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_s": percentile(latencies, 0.50),
+            "latency_p90_s": percentile(latencies, 0.90),
+            "latency_p99_s": percentile(latencies, 0.99),
+            "latency_max_s": latencies[-1] if latencies else 0.0,
+        }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the cognitive agent over a JSONL file of prompts")
+    parser.add_argument("input", help="JSONL file with one record per line")
+    parser.add_argument("output", help="JSONL results file; reruns resume from it")
+    parser.add_argument("--concurrency", type=int, default=8, help="Records processed at once")
+    parser.add_argument("--id-field", default="id", help="Record field used as the id (default: line number)")
+    parser.add_argument("--input-field", default="input", help="Record field holding the prompt")
+    parser.add_argument("--preferences", help="JSON file with UserPreferences applied to every record")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocess records that previously failed")
+    parser.add_argument("--summary", help="Also write the summary JSON to this path")
+    args = parser.parse_args(argv)
+
+    preferences = None
+    if args.preferences:
+        with open(args.preferences, encoding="utf-8") as f:
+            preferences = UserPreferences(**json.load(f))
+
+    runner = BatchRunner(
+        concurrency=args.concurrency,
+        preferences=preferences,
+        id_field=args.id_field,
+        input_field=args.input_field,
+        retry_failed=args.retry_failed
+    )
+    summary = asyncio.run(runner.run(args.input, args.output))
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
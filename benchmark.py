@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from batch import percentile
+from fake_model import FakeGenerativeModel
+from main import CognitiveAgent
+from memory import MemoryLayer
+from perception import PerceptionLayer, UserPreferences
+
+PREFERENCES = UserPreferences(
+    likes=["hiking", "jazz"],
+    location="Lisbon",
+    favorite_topics=["astronomy", "cooking"]
+)
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+async def make_agent(model: FakeGenerativeModel, **memory_options: Any) -> CognitiveAgent:
+    """Agent on the fake model with the response cache off, so every turn calls it"""
+    agent = CognitiveAgent(perception=PerceptionLayer(model=model, cache=None))
+    if memory_options:
+        agent.memory = MemoryLayer(**memory_options)
+    await agent.set_user_preferences(PREFERENCES)
+    return agent
+
+async def bench_layers(model: FakeGenerativeModel, turns: int) -> Dict[str, Any]:
+    """Per-stage latency over a sequence of turns in one session"""
+    agent = await make_agent(model)
+    stages: Dict[str, List[float]] = {}
+    totals: List[float] = []
+    for turn in range(turns):
+        response = await agent.process(f"Question number {turn} about my interests")
+        totals.append(response.execution_time)
+        for stage, seconds in response.stage_timings.items():
+            stages.setdefault(stage, []).append(seconds)
+    await agent.drain()
+    return {
+        "end_to_end": latency_stats(totals),
+        "stages": {stage: latency_stats(samples) for stage, samples in stages.items()},
+    }
+
+async def bench_throughput(model: FakeGenerativeModel, sessions: int, turns: int) -> Dict[str, Any]:
+    """End-to-end throughput with many concurrent sessions on one loop"""
+    agents = [await make_agent(model) for _ in range(sessions)]
+    latencies: List[float] = []
+
+    async def run_session(index: int, agent: CognitiveAgent) -> None:
+        for turn in range(turns):
+            start = time.perf_counter()
+            await agent.process(f"Session {index} turn {turn}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i, agent) for i, agent in enumerate(agents)))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "elapsed_s": elapsed,
+        "turns_per_s": sessions * turns / elapsed,
+        "latency": latency_stats(latencies),
+    }
+
+def _time_per_call(fn: Callable[[int], Any], calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+def bench_memory(sizes: List[int], probes: int = 200) -> List[Dict[str, Any]]:
+    """MemoryLayer insert and retrieve cost as the number of memories grows"""
+    results = []
+    for size in sizes:
+        memory = MemoryLayer(max_memories=size)
+        start_rss = rss_bytes()
+        start = time.perf_counter()
+        for i in range(size):
+            memory.add_memory(f"memory {i} about topic {i % 97} near city {i % 13}", {"i": i % 5}, 0.5)
+        fill_s = time.perf_counter() - start
+        results.append({
+            "memories": size,
+            "fill_s": fill_s,
+            "insert_at_capacity_us": _time_per_call(
+                lambda i: memory.add_memory(f"extra memory {i}", {}, 0.6), probes
+            ) * 1e6,
+            "retrieve_us": _time_per_call(
+                lambda i: memory.retrieve_relevant_memories(f"topic {i % 97} city {i % 13}"), probes
+            ) * 1e6,
+            "rss_growth_bytes": rss_bytes() - start_rss,
+        })
+    return results
+
+async def bench_long_session(model: FakeGenerativeModel, turns: int, every: int) -> List[Dict[str, Any]]:
+    """RSS and response size as one session grows"""
+    agent = await make_agent(model)
+    samples = []
+    for turn in range(1, turns + 1):
+        response = await agent.process(f"Long session turn {turn}")
+        if turn % every == 0 or turn == turns:
+            await agent.drain()
+            samples.append({
+                "turn": turn,
+                "rss_bytes": rss_bytes(),
+                "response_bytes": len(response.model_dump_json()),
+                "reasoning_steps": len(response.reasoning_chain),
+                "memories": len(agent.memory.store),
+            })
+    return samples
+
+# Snippet timed by the startup suite: import the agent and build one session
+_READY_SNIPPET = (
+    "import time; t = time.perf_counter()\n"
+    "from main import CognitiveAgent\n"
+    "from perception import PerceptionLayer\n"
+    "from fake_model import FakeGenerativeModel\n"
+    "CognitiveAgent(perception=PerceptionLayer(model=FakeGenerativeModel()))\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+def _run_python(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable] + args,
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def profile_imports(module: str, top: int = 15) -> Dict[str, Any]:
+    """Per-module import cost of a fresh ``import module``, from ``python -X importtime``"""
+    result = _run_python(["-X", "importtime", "-c", f"import {module}"])
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header row
+        name = fields[2].rstrip()
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": self_us / 1000,
+            "cumulative_ms": cumulative_us / 1000,
+        })
+    total = next((m["cumulative_ms"] for m in reversed(modules) if m["module"] == module), 0.0)
+    heaviest = sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)
+    return {
+        "total_ms": total,
+        "top_cumulative": [m for m in heaviest if m["module"] != module][:top],
+        "top_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:top],
+    }
+
+def bench_startup(modules: List[str], repeats: int = 5, top: int = 15) -> Dict[str, Any]:
+    """Cold-start cost: time until an agent session exists, plus per-module import cost"""
+    ready = []
+    for _ in range(repeats):
+        result = _run_python(["-c", _READY_SNIPPET])
+        if result.returncode == 0:
+            ready.append(float(result.stdout.strip().splitlines()[-1]))
+    return {
+        "ready": latency_stats(ready),
+        "imports": {module: profile_imports(module, top) for module in modules},
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Any, baseline: Any, path: str = "") -> List[str]:
+    """Lines describing numeric changes between two result trees"""
+    lines: List[str] = []
+    if isinstance(current, dict) and isinstance(baseline, dict):
+        for key in current:
+            if key in baseline:
+                lines += compare(current[key], baseline[key], f"{path}.{key}" if path else key)
+    elif isinstance(current, list) and isinstance(baseline, list):
+        for index, (a, b) in enumerate(zip(current, baseline)):
+            lines += compare(a, b, f"{path}[{index}]")
+    elif isinstance(current, (int, float)) and isinstance(baseline, (int, float)) and not isinstance(current, bool):
+        if baseline:
+            lines.append(f"{path}: {baseline:.6g} -> {current:.6g} ({(current - baseline) / baseline:+.1%})")
+    return lines
+
+async def run_suites(args: argparse.Namespace) -> Dict[str, Any]:
+    def model() -> FakeGenerativeModel:
+        return FakeGenerativeModel(
+            latency=args.latency,
+            jitter=args.jitter,
+            output_tokens=args.output_tokens,
+            seed=args.seed
+        )
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fake_model": {
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "output_tokens": args.output_tokens,
+                "seed": args.seed,
+            },
+        }
+    }
+    suites = set(args.suites)
+    if "startup" in suites:
+        results["startup"] = bench_startup(args.startup_modules, top=args.startup_top)
+    if "layers" in suites:
+        results["layers"] = await bench_layers(model(), args.turns)
+    if "throughput" in suites:
+        results["throughput"] = [
+            await bench_throughput(model(), sessions, args.turns) for sessions in args.sessions
+        ]
+    if "memory" in suites:
+        results["memory"] = bench_memory(args.memory_sizes)
+    if "long_session" in suites:
+        results["long_session"] = await bench_long_session(model(), args.long_turns, max(1, args.long_turns // 10))
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the cognitive agent")
+    parser.add_argument("--suites", nargs="+", default=["layers", "throughput", "memory", "long_session"],
+                        choices=["layers", "throughput", "memory", "long_session", "startup"])
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Fake model extra random latency (s)")
+    parser.add_argument("--output-tokens", type=int, default=200, help="Fake model output length in words")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--turns", type=int, default=20, help="Turns per session")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100], help="Concurrent session counts")
+    parser.add_argument("--memory-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--long-turns", type=int, default=500, help="Turns in the long-session suite")
+    parser.add_argument("--startup-modules", nargs="+", default=["main", "server", "batch"],
+                        help="Modules whose import cost the startup suite profiles")
+    parser.add_argument("--startup-top", type=int, default=15, help="Heaviest imports listed per module")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_suites(args))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for line in compare({k: v for k, v in results.items() if k != "meta"}, baseline):
+            print(line, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
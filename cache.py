@@ -0,0 +1,297 @@
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Awaitable, List, Tuple, TypeVar
+from collections import OrderedDict
+import asyncio
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+T = TypeVar("T")
+
+def normalize_input(input_text: str) -> str:
+    """Collapse whitespace and case so near-identical prompts share a key"""
+    return " ".join(input_text.split()).casefold()
+
+def make_cache_key(input_text: str,
+                   preferences: Dict[str, Any],
+                   generation_config: Dict[str, Any],
+                   model: str = "gemini-2.0-flash") -> str:
+    """Content address for a perception request"""
+    payload = json.dumps(
+        {
+            "input": normalize_input(input_text),
+            "preferences": preferences,
+            "generation_config": generation_config,
+            "model": model,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """LRU cache with TTL expiry and an optional SQLite tier that survives restarts.
+
+    Values must be JSON-serializable (e.g. ``model.model_dump()``). Disk
+    writes are buffered and committed in batches by a background thread,
+    which also drops expired rows and the oldest rows past disk_max_entries,
+    so callers on the event loop never wait for a commit. The database runs
+    in WAL mode and lookups use their own connection, so they never wait
+    for the writer either.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl: Optional[float] = 3600.0,
+                 disk_path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = None,
+                 flush_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_max_entries = max_entries if disk_max_entries is None else disk_max_entries
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Written but not yet committed: key -> (created, json)
+        self._pending: Dict[str, Tuple[float, str]] = {}
+        self._db_lock = threading.Lock()
+        self._reader: Optional[sqlite3.Connection] = None
+        self._read_lock = self._db_lock
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._db.commit()
+            (mode,) = self._db.execute("PRAGMA journal_mode=WAL").fetchone()
+            if mode == "wal":
+                # Readers see the last commit and never block on the writer
+                self._reader = sqlite3.connect(disk_path, check_same_thread=False)
+                self._read_lock = threading.Lock()
+            else:
+                # In-memory databases can't be shared between connections
+                self._reader = self._db
+            atexit.register(self.flush)
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            row = self._pending.get(key)
+
+        if row is None and self._reader is not None:
+            # A primary-key read; expired rows are left for the writer to prune
+            with self._read_lock:
+                found = self._reader.execute(
+                    "SELECT created, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            row = tuple(found) if found is not None else None
+
+        with self._lock:
+            if row is not None and not self._expired(row[0], now):
+                value = json.loads(row[1])
+                self._store(key, value, row[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value in memory and, if configured, queue it for disk"""
+        created = time.time()
+        with self._lock:
+            self._store(key, value, created)
+            if self._db is None:
+                return
+            self._pending[key] = (created, json.dumps(value, default=str))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+                self._writer.start()
+        self._wake.set()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            # Let a burst of sets accumulate into one transaction
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit queued disk writes and prune the disk tier"""
+        if self._db is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        with self._db_lock:
+            if pending:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    [(key, value, created) for key, (created, value) in pending.items()]
+                )
+            if self.ttl is not None:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.disk_max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY created LIMIT ?)",
+                    (count - self.disk_max_entries,)
+                )
+            self._db.commit()
+
+    def _store(self, key: str, value: Dict[str, Any], created: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class _Call:
+    """One in-flight call, the chunks it has published and the number of callers awaiting it"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.task: Optional["asyncio.Task"] = None
+        self.waiters = 0
+        self.chunks: List[Any] = []
+        # Resolved and replaced on every publish, waking all subscribers at once
+        self.changed: asyncio.Future = loop.create_future()
+
+    def publish(self, chunk: Any) -> None:
+        self.chunks.append(chunk)
+        self.changed.set_result(None)
+        self.changed = self.loop.create_future()
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one underlying call.
+
+    The first caller for a key starts the work as a task; later callers await
+    the same task. A caller that is cancelled only stops waiting; the shared
+    task is cancelled once its last waiter has gone away.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for this key is currently running"""
+        call = self._calls.get(key)
+        return call is not None and not call.task.done()
+
+    def _join(self, key: str, start: Callable[[_Call], Awaitable[Any]]) -> _Call:
+        """The running call for key, or a new one running start(call)"""
+        loop = asyncio.get_running_loop()
+        call = self._calls.get(key)
+        if call is None or call.task.done() or call.loop is not loop:
+            call = _Call(loop)
+            call.task = loop.create_task(start(call))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        return call
+
+    @staticmethod
+    def _leave(call: _Call) -> None:
+        call.waiters -= 1
+        if call.waiters == 0 and not call.task.done():
+            call.task.cancel()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run factory() unless an identical call is already in flight"""
+        call = self._join(key, lambda _: factory())
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            self._leave(call)
+
+    async def stream(self,
+                     key: str,
+                     factory: Callable[[Callable[[Any], None]], Awaitable[T]]) -> AsyncIterator[Any]:
+        """Streaming do(): yield the chunks the call publishes, then its result.
+
+        factory receives a publish callback. Callers that join late first get
+        the chunks published so far; joining a plain do() call yields only
+        the result.
+        """
+        call = self._join(key, lambda call: factory(call.publish))
+        try:
+            seen = 0
+            while True:
+                while seen < len(call.chunks):
+                    yield call.chunks[seen]
+                    seen += 1
+                if call.task.done():
+                    break
+                # Neither is cancelled if this subscriber is
+                await asyncio.wait({call.changed, call.task}, return_when=asyncio.FIRST_COMPLETED)
+            yield call.task.result()
+        finally:
+            self._leave(call)
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Started vs coalesced call counters"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,252 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from embeddings import tokenize
+from context_builder import pack_texts, truncate_tokens
+import time
+import zlib
+import numpy as np
+
+# Universal hashing modulo a Mersenne prime; a and b stay below 2**31 and
+# shingle hashes below 2**32, so a * x + b never overflows uint64
+_PRIME = np.uint64((1 << 61) - 1)
+
+class MinHasher:
+    """MinHash signatures over word n-gram shingles"""
+
+    def __init__(self, num_perm: int = 64, ngram: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        n = min(self.ngram, max(1, len(tokens)))
+        grams = {" ".join(tokens[i:i + n]) for i in range(max(1, len(tokens) - n + 1))}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity estimated from two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures"""
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+        self._keys: Dict[int, List[Tuple[int, bytes]]] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, item_id: int, signature: np.ndarray) -> None:
+        keys = self._band_keys(signature)
+        self._keys[item_id] = keys
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        for key in self._keys.pop(item_id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def candidates(self, signature: np.ndarray) -> Set[int]:
+        found: Set[int] = set()
+        for key in self._band_keys(signature):
+            found |= self._buckets.get(key, set())
+        return found
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+class MemoryConsolidator:
+    """Keeps a MemoryLayer compact without losing recall.
+
+    Each step indexes up to ``batch_size`` memories added since the last
+    step. New memories whose estimated Jaccard similarity to an indexed one
+    reaches ``threshold`` are merged into a single memory: the newest text,
+    combined importance (capped at ``max_merged_importance``) and a "merged"
+    count. Every step also folds up to
+    ``summary_size`` cold memories (older than ``cold_age`` seconds and less
+    important than ``cold_importance``) into one summary memory.
+
+    Steps are synchronous and bounded: both the dedup pass and the cold scan
+    walk ids from a cursor, never the whole store. tick() runs a step only
+    every ``interval`` turns, so the background pipeline stage costs nothing
+    on most turns.
+    """
+
+    def __init__(self,
+                 memory: Any,
+                 threshold: float = 0.8,
+                 num_perm: int = 64,
+                 bands: int = 16,
+                 batch_size: int = 32,
+                 cold_age: float = 24 * 3600.0,
+                 cold_importance: float = 0.4,
+                 summary_size: int = 8,
+                 summary_tokens: int = 120,
+                 max_merged_importance: float = 0.9,
+                 interval: int = 8,
+                 scan_limit: int = 256):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.memory = memory
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.cold_age = cold_age
+        self.cold_importance = cold_importance
+        self.summary_size = summary_size
+        self.summary_tokens = summary_tokens
+        self.max_merged_importance = max_merged_importance
+        self.interval = interval
+        self.scan_limit = scan_limit
+        self.hasher = MinHasher(num_perm)
+        self.lsh = LSHIndex(bands, num_perm // bands)
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._cursor = 0
+        # Next id for the cold scan; ids below it are gone, too important,
+        # or already in _cold_candidates
+        self._cold_cursor = 0
+        self._cold_candidates: List[int] = []
+        self._turns = 0
+
+    def discard(self, memory_id: int) -> None:
+        """Forget a memory that left the store"""
+        if self._signatures.pop(memory_id, None) is not None:
+            self.lsh.remove(memory_id)
+
+    def reset(self) -> None:
+        self._signatures.clear()
+        self.lsh.clear()
+        self._cursor = 0
+        self._cold_cursor = 0
+        self._cold_candidates.clear()
+        self._turns = 0
+
+    def tick(self) -> Dict[str, int]:
+        """Count one turn; run a step every ``interval`` turns"""
+        self._turns += 1
+        if self._turns % max(1, self.interval):
+            return {}
+        return self.step()
+
+    def step(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Index new memories, merge near-duplicates and summarize one cold group"""
+        now = time.time() if now is None else now
+        stats = {"indexed": 0, "merged": 0, "summarized": 0}
+        store = self.memory.store
+        end = min(store.next_id, self._cursor + self.batch_size)
+        for memory_id in range(self._cursor, end):
+            if memory_id in store:
+                stats["indexed"] += 1
+                stats["merged"] += self._index(memory_id)
+        self._cursor = end
+        stats["summarized"] = self._summarize_cold(now)
+        return stats
+
+    def _index(self, memory_id: int) -> int:
+        """Index one memory, merging it with its near-duplicates; return how many were merged"""
+        content = self.memory._entry(memory_id).content
+        signature = self.hasher.signature(content)
+        duplicates = [
+            other for other in self.lsh.candidates(signature)
+            if estimated_similarity(signature, self._signatures[other]) >= self.threshold
+        ]
+        if not duplicates:
+            self._signatures[memory_id] = signature
+            self.lsh.add(memory_id, signature)
+            return 0
+
+        group = [self.memory._entry(other) for other in duplicates]
+        newest = self.memory._entry(memory_id)
+        keep = 1.0
+        merged = newest.metadata.get("merged", 1)
+        for entry in group + [newest]:
+            keep *= 1.0 - entry.importance
+        for entry in group:
+            merged += entry.metadata.get("merged", 1)
+        metadata = dict(newest.metadata, merged=merged)
+        timestamp = max(entry.timestamp.timestamp() for entry in group + [newest])
+
+        # Repetition reinforces importance (noisy-OR), but never past the cap
+        # unless one of the merged memories was already above it
+        importance = max(
+            max(entry.importance for entry in group + [newest]),
+            min(self.max_merged_importance, 1.0 - keep)
+        )
+
+        self.memory.remove_memories(duplicates + [memory_id])
+        # Re-inserted under a new id, which a later step indexes again
+        self.memory._insert(content, metadata, importance, timestamp)
+        return len(duplicates)
+
+    def _summarize_cold(self, now: float) -> int:
+        """Replace one group of cold memories with a summary memory; return the group size"""
+        if self.summary_size < 2:
+            return 0
+        group = self._cold_group(now - self.cold_age)
+        if len(group) < self.summary_size:
+            return 0
+
+        per_item = max(8, self.summary_tokens // len(group))
+        points = pack_texts((truncate_tokens(entry.content, per_item) for _, entry in group),
+                            self.summary_tokens, separator="; ")
+        content = f"Summary of {len(group)} earlier memories: " + "; ".join(points)
+        metadata = {
+            "kind": "summary",
+            "summarized": sum(entry.metadata.get("merged", 1) for _, entry in group),
+        }
+        # At least cold_importance, so summaries are not picked up as cold again
+        importance = max([self.cold_importance] + [entry.importance for _, entry in group])
+        timestamp = max(entry.timestamp.timestamp() for _, entry in group)
+
+        self.memory.remove_memories([memory_id for memory_id, _ in group])
+        self.memory._insert(content, metadata, importance, timestamp)
+        return len(group)
+
+    def _cold_group(self, before: float) -> List[Tuple[int, Any]]:
+        """The next summary_size cold memories, or fewer if not enough are known yet.
+
+        Each call scans at most scan_limit ids, resuming where the previous
+        scan ended; cold memories found along the way are kept as candidates
+        until a full group exists. Ids are assigned in time order, so the scan
+        waits at the first live memory that is not old enough yet.
+        Importance never changes in place, so skipped ids never need a rescan.
+        """
+        store = self.memory.store
+        # Candidates may have been merged or evicted since they were found
+        candidates = [memory_id for memory_id in self._cold_candidates if memory_id in store]
+        end = min(store.next_id, self._cold_cursor + self.scan_limit)
+        while self._cold_cursor < end and len(candidates) < self.summary_size:
+            memory_id = self._cold_cursor
+            if memory_id in store:
+                if store.timestamp(memory_id) >= before:
+                    break
+                if (store.importance(memory_id) < self.cold_importance
+                        and self.memory._entry(memory_id).metadata.get("kind") != "summary"):
+                    candidates.append(memory_id)
+            self._cold_cursor += 1
+
+        if len(candidates) < self.summary_size:
+            self._cold_candidates = candidates
+            return []
+        self._cold_candidates = candidates[self.summary_size:]
+        return [(memory_id, self.memory._entry(memory_id)) for memory_id in candidates[:self.summary_size]]
@@ -0,0 +1,191 @@
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from collections import Counter, deque
+from embeddings import tokenize
+import math
+import os
+import weakref
+
+# Prompt budget in (estimated) tokens for everything except the model output
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("PERCEPTION_CONTEXT_TOKENS", "1500"))
+DEFAULT_SUMMARY_TOKENS = int(os.getenv("PERCEPTION_SUMMARY_TOKENS", "200"))
+
+# Roughly four characters per token for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; no tokenizer round-trip"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a word boundary where possible"""
+    limit = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    cut = text[:limit - 1]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+def pack_texts(texts: Iterable[str], max_tokens: int, per_item_tokens: Optional[int] = None,
+               separator: str = " ") -> List[str]:
+    """Take texts in order, each truncated to per_item_tokens, until max_tokens is spent"""
+    packed: List[str] = []
+    remaining = max_tokens
+    gap = estimate_tokens(separator)
+    for text in texts:
+        if per_item_tokens is not None:
+            text = truncate_tokens(text, per_item_tokens)
+        cost = estimate_tokens(text) + (gap if packed else 0)
+        if cost > remaining:
+            # Fit a shortened final item rather than leave the budget unused
+            if remaining - gap > 8:
+                packed.append(truncate_tokens(text, remaining - gap))
+            break
+        packed.append(text)
+        remaining -= cost
+    return packed
+
+# id(preferences) -> (weakref, rendered prefix); models are unhashable, so
+# entries are keyed by identity and dropped when the object is collected
+_preference_prefixes: Dict[int, Tuple["weakref.ref", str]] = {}
+
+def render_preferences(preferences: Any) -> str:
+    """User Context block for a UserPreferences object, rendered once per object"""
+    key = id(preferences)
+    entry = _preference_prefixes.get(key)
+    if entry is not None and entry[0]() is preferences:
+        return entry[1]
+    prefix = (
+        "User Context:\n"
+        f"- Location: {preferences.location}\n"
+        f"- Interests: {', '.join(preferences.likes)}\n"
+        f"- Favorite Topics: {', '.join(preferences.favorite_topics)}\n"
+    )
+    _preference_prefixes[key] = (weakref.ref(preferences, lambda _: _preference_prefixes.pop(key, None)), prefix)
+    return prefix
+
+class RollingSummary:
+    """Session summary updated one turn at a time.
+
+    Each folded turn becomes a short digest line. When the digests exceed
+    max_tokens the oldest ones are reduced to their keywords, so the cost of
+    an update does not depend on the length of the session.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_SUMMARY_TOKENS, digest_tokens: int = 40, keywords: int = 12):
+        self.max_tokens = max_tokens
+        self.digest_tokens = digest_tokens
+        self.keywords = keywords
+        self.turns = 0
+        self._digests: Deque[Tuple[str, int]] = deque()
+        self._digest_total = 0
+        self._topics: Counter = Counter()
+        self._rendered: Optional[str] = None
+
+    def add(self, user_text: str, response_text: str) -> None:
+        """Fold one finished turn into the summary"""
+        half = self.digest_tokens // 2
+        digest = f"- {truncate_tokens(user_text, half)} -> {truncate_tokens(response_text, half)}"
+        cost = estimate_tokens(digest)
+        self._digests.append((digest, cost))
+        self._digest_total += cost
+        self.turns += 1
+        keyword_budget = self.keywords * 3
+        while self._digests and self._digest_total > self.max_tokens - keyword_budget:
+            old, old_cost = self._digests.popleft()
+            self._digest_total -= old_cost
+            self._topics.update(token for token in tokenize(old) if len(token) > 3)
+        self._rendered = None
+
+    def render(self) -> str:
+        if self._rendered is None:
+            lines = []
+            if self._topics:
+                topics = ", ".join(token for token, _ in self._topics.most_common(self.keywords))
+                lines.append(f"- Earlier topics: {topics}")
+            lines.extend(digest for digest, _ in self._digests)
+            self._rendered = "\n".join(lines)
+        return self._rendered
+
+    def clear(self) -> None:
+        self.turns = 0
+        self._digests.clear()
+        self._digest_total = 0
+        self._topics.clear()
+        self._rendered = None
+
+class ContextBuilder:
+    """Assembles perception prompts within a token budget.
+
+    Priority, highest first: user context, the input itself, relevant
+    memories, recent turns, then the rolling summary of older turns.
+    Turns leaving the recent window are folded into the summary.
+    """
+
+    def __init__(self,
+                 max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+                 recent_turns: int = 4,
+                 turn_tokens: int = 150,
+                 memory_tokens: int = 120,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS):
+        self.max_tokens = max_tokens
+        self.turn_tokens = turn_tokens
+        self.memory_tokens = memory_tokens
+        self.recent: Deque[Tuple[str, str]] = deque(maxlen=recent_turns)
+        self.summary = RollingSummary(summary_tokens)
+
+    def record_turn(self, user_text: str, response_text: str) -> None:
+        """Remember a finished turn"""
+        if not self.recent.maxlen:
+            self.summary.add(user_text, response_text)
+            return
+        if len(self.recent) == self.recent.maxlen:
+            self.summary.add(*self.recent[0])
+        self.recent.append((user_text, response_text))
+
+    def clear(self) -> None:
+        self.recent.clear()
+        self.summary.clear()
+
+    def build(self, input_text: str, preferences: Any, memories: Iterable[str] = ()) -> str:
+        """Render the prompt for one input"""
+        prefix = render_preferences(preferences)
+        remaining = self.max_tokens - estimate_tokens(prefix)
+        # The input always goes in, shortened only if it alone would blow the budget
+        input_text = truncate_tokens(input_text, max(remaining // 2, remaining - self.memory_tokens * 2))
+        remaining -= estimate_tokens(input_text) + 8
+
+        # Skip memories that merely repeat a recent answer
+        recent_answers = {answer for _, answer in self.recent}
+        memory_lines = pack_texts(
+            (f"- {m}" for m in memories if m not in recent_answers),
+            remaining, self.memory_tokens + 1, separator="\n"
+        )
+        remaining -= sum(estimate_tokens(line) + 1 for line in memory_lines)
+
+        turn_lines: List[str] = []
+        for user_text, answer in reversed(self.recent):
+            line = (f"User: {truncate_tokens(user_text, self.turn_tokens // 3)}\n"
+                    f"Assistant: {truncate_tokens(answer, self.turn_tokens)}")
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            turn_lines.insert(0, line)
+            remaining -= cost
+
+        summary = self.summary.render()
+        if summary and estimate_tokens(summary) > remaining - 8:
+            summary = truncate_tokens(summary, remaining - 8) if remaining > 24 else ""
+
+        sections = [prefix]
+        if summary:
+            sections.append(f"Conversation summary:\n{summary}\n")
+        if turn_lines:
+            sections.append("Recent turns:\n" + "\n".join(turn_lines) + "\n")
+        if memory_lines:
+            sections.append("Relevant memories:\n" + "\n".join(memory_lines) + "\n")
+        sections.append(f"Input to process: {input_text}")
+        return "\n".join(sections)
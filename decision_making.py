@@ -1,6 +1,12 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, field_serializer
+from typing import List, Dict, Any, Optional, Deque, Iterator, Mapping
+from collections import deque
 from enum import Enum
+from itertools import islice
+from types import MappingProxyType
+from scoring import ScoringEngine, ScoringPolicy
+import numpy as np
+import time
 
 class ActionType(Enum):
     """Types of actions the agent can take"""
@@ -11,6 +17,52 @@ class ActionType(Enum):
     MODIFY = "modify"
     DELETE = "delete"
 
+def _abbreviate(value: Any, limit: int) -> str:
+    """Bounded-size rendering of a (possibly nested) value"""
+    if limit < 8:
+        return "…"
+    if isinstance(value, Mapping):
+        items = ", ".join(f"{key}: {_abbreviate(item, limit // 4)}" for key, item in islice(value.items(), 8))
+        text = "{" + items + (", …" if len(value) > 8 else "") + "}"
+    elif isinstance(value, (list, tuple)):
+        text = f"[{len(value)} items]"
+    else:
+        text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+class DecisionContext(Mapping):
+    """Immutable decision context shared by reference between decisions.
+
+    Rendering is deferred to summary(), which is size-capped and cached, so
+    a large context is never copied or stringified per decision.
+    """
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = MappingProxyType(dict(data))
+        self._summaries: Dict[int, str] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def summary(self, max_chars: int = 300) -> str:
+        """Size-capped rendering of the context"""
+        summary = self._summaries.get(max_chars)
+        if summary is None:
+            summary = _abbreviate(self._data, max_chars)
+            self._summaries[max_chars] = summary
+        return summary
+
+    def __repr__(self) -> str:
+        return f"DecisionContext({self.summary()})"
+
+    __str__ = __repr__
+
 class Decision(BaseModel):
     """Model for a single decision"""
     action_type: ActionType
@@ -19,6 +71,13 @@ class Decision(BaseModel):
     reasoning: str
     model: str = "gemini-2.0-flash"
 
+    @field_serializer("parameters", when_used="json")
+    def _serialize_parameters(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: value.summary() if isinstance(value, DecisionContext) else value
+            for key, value in parameters.items()
+        }
+
 class DecisionResponse(BaseModel):
     """Model for decision layer response"""
     decisions: List[Decision]
@@ -26,81 +85,114 @@ class DecisionResponse(BaseModel):
     reasoning_chain: List[str]
     model: str = "gemini-2.0-flash"
 
+class DecisionTrace:
+    """Reasoning steps recorded for a single evaluate_options call"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.created_at = time.time()
+        # Without the model prefix, which render adds
+        self.steps: List[str] = []
+        self._rendered: Optional[List[str]] = None
+
+    def add(self, step: str) -> None:
+        self.steps.append(step)
+        self._rendered = None
+
+    def render(self) -> List[str]:
+        """Steps prefixed with the model, cached until the trace changes"""
+        if self._rendered is None:
+            prefix = f"[{self.model}] "
+            self._rendered = [prefix + step for step in self.steps]
+        return self._rendered
+
 class DecisionLayer:
-    def __init__(self):
-        self.reasoning_chain: List[str] = []
+    def __init__(self, trace_history: int = 100, policy: Optional[ScoringPolicy] = None):
         self.model = "gemini-2.0-flash"
+        # Pluggable policy scoring every (context, action) pair in one pass
+        self.scoring = ScoringEngine(policy)
+        # Bounded history of past traces; each request gets its own trace
+        self.traces: Deque[DecisionTrace] = deque(maxlen=trace_history)
+        self.current_trace: Optional[DecisionTrace] = None
+
+    @property
+    def reasoning_chain(self) -> List[str]:
+        """Reasoning steps of the most recent trace"""
+        return self.current_trace.render() if self.current_trace else []
+
+    def _start_trace(self) -> DecisionTrace:
+        self.current_trace = DecisionTrace(self.model)
+        self.traces.append(self.current_trace)
+        return self.current_trace
 
     def add_reasoning_step(self, step: str) -> None:
-        """Add a step to the reasoning chain"""
-        self.reasoning_chain.append(f"[{self.model}] {step}")
+        """Add a step to the current reasoning trace"""
+        trace = self.current_trace or self._start_trace()
+        trace.add(step)
 
     def evaluate_options(self, 
-                        context: Dict[str, Any],
+                        context: Mapping[str, Any],
                         available_actions: List[ActionType],
                         constraints: Optional[Dict[str, Any]] = None) -> DecisionResponse:
         """Evaluate possible actions and make decisions"""
-        if constraints is None:
-            constraints = {}
-
-        # Initialize decisions list
-        decisions: List[Decision] = []
-
-        # Evaluate each possible action
-        for action in available_actions:
-            confidence = self._calculate_confidence(action, context, constraints)
-            reasoning = self._generate_reasoning(action, context)
-            
-            decision = Decision(
-                action_type=action,
-                parameters=self._get_action_parameters(action, context),
-                confidence=confidence,
-                reasoning=reasoning,
+        return self.evaluate_many([context], available_actions, [constraints])[0]
+
+    def score_many(self,
+                   contexts: List[Mapping[str, Any]],
+                   available_actions: List[ActionType],
+                   constraints: Optional[List[Optional[Dict[str, Any]]]] = None) -> np.ndarray:
+        """Confidence matrix (contexts x actions) without building decisions"""
+        return self.scoring.score(contexts, [action.value for action in available_actions], constraints)
+
+    def evaluate_many(self,
+                      contexts: List[Mapping[str, Any]],
+                      available_actions: List[ActionType],
+                      constraints: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[DecisionResponse]:
+        """Evaluate a batch of contexts, scoring all of them in one pass"""
+        # Shared by every decision below instead of being copied into each one
+        contexts = [
+            context if isinstance(context, DecisionContext) else DecisionContext(context)
+            for context in contexts
+        ]
+        scores = self.score_many(contexts, available_actions, constraints)
+
+        responses: List[DecisionResponse] = []
+        for context, row in zip(contexts, scores.tolist()):
+            decisions: List[Decision] = []
+            trace = self._start_trace()
+
+            # Evaluate each possible action
+            for action, confidence in zip(available_actions, row):
+                reasoning = self._generate_reasoning(action, context)
+
+                decision = Decision(
+                    action_type=action,
+                    parameters=self._get_action_parameters(action, context),
+                    confidence=confidence,
+                    reasoning=reasoning,
+                    model=self.model
+                )
+
+                decisions.append(decision)
+                trace.add(f"Evaluated {action.value}: {reasoning}")
+
+            # Select the best action based on confidence
+            final_decision = max(decisions, key=lambda x: x.confidence)
+
+            responses.append(DecisionResponse(
+                decisions=decisions,
+                final_action=final_decision,
+                reasoning_chain=trace.render(),
                 model=self.model
-            )
-            
-            decisions.append(decision)
-            self.add_reasoning_step(f"Evaluated {action.value}: {reasoning}")
-
-        # Select the best action based on confidence
-        final_decision = max(decisions, key=lambda x: x.confidence)
-
-        return DecisionResponse(
-            decisions=decisions,
-            final_action=final_decision,
-            reasoning_chain=self.reasoning_chain,
-            model=self.model
-        )
-
-    def _calculate_confidence(self, 
-                            action: ActionType,
-                            context: Dict[str, Any],
-                            constraints: Dict[str, Any]) -> float:
-        """Calculate confidence score for an action"""
-        # This is a simplified confidence calculation
-        # In a real implementation, this would be more sophisticated
-        base_confidence = 0.5
-        
-        # Adjust confidence based on context
-        if "user_preferences" in context:
-            base_confidence += 0.2
-            
-        # Adjust confidence based on constraints
-        if not constraints:
-            base_confidence += 0.1
-            
-        # Adjust confidence based on model
-        if context.get("model") == "gemini-2.0-flash":
-            base_confidence += 0.1  # Slightly higher confidence for Flash model
-            
-        return min(base_confidence, 1.0)
-
-    def _generate_reasoning(self, action: ActionType, context: Dict[str, Any]) -> str:
+            ))
+        return responses
+
+    def _generate_reasoning(self, action: ActionType, context: DecisionContext) -> str:
         """Generate reasoning for an action"""
         model_info = f"Using {context.get('model', 'gemini-2.0-flash')}"
-        return f"{model_info}: Action {action.value} is appropriate given the context: {context}"
+        return f"{model_info}: Action {action.value} is appropriate given the context: {context.summary()}"
 
-    def _get_action_parameters(self, action: ActionType, context: Dict[str, Any]) -> Dict[str, Any]:
+    def _get_action_parameters(self, action: ActionType, context: DecisionContext) -> Dict[str, Any]:
         """Get parameters for an action"""
         # This would be more sophisticated in a real implementation
         return {
@@ -0,0 +1,158 @@
+from typing import Dict, List, Protocol, Tuple
+import hashlib
+import re
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of a fixed dimension"""
+    dim: int
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+class HashingEmbedder:
+    """Deterministic offline embedder using the signed hashing trick.
+
+    Unigrams and bigrams are hashed into ``dim`` buckets with a stable hash,
+    so vectors are identical across processes and need no network or model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._bucket_cache: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        bucket = self._bucket_cache.get(feature)
+        if bucket is None:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            bucket = (value % self.dim, 1.0 if (value >> 63) & 1 else -1.0)
+            if len(self._bucket_cache) < 200_000:
+                self._bucket_cache[feature] = bucket
+        return bucket
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+class VectorIndex:
+    """Contiguous embedding matrix with importance and timestamp columns.
+
+    Rows stay packed: removing an item moves the last row into its slot, so a
+    query is a single matrix-vector product over ``[:size]``.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 16):
+        self.dim = dim
+        self.size = 0
+        self.vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self.importance = np.zeros(initial_capacity, dtype=np.float32)
+        self.timestamps = np.zeros(initial_capacity, dtype=np.float64)
+        self.ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+
+    def _grow(self) -> None:
+        capacity = max(1, len(self.ids) * 2)
+        self.vectors = np.resize(self.vectors, (capacity, self.dim))
+        self.importance = np.resize(self.importance, capacity)
+        self.timestamps = np.resize(self.timestamps, capacity)
+        self.ids = np.resize(self.ids, capacity)
+
+    def add(self, item_id: int, vector: np.ndarray, importance: float, timestamp: float) -> None:
+        if self.size == len(self.ids):
+            self._grow()
+        row = self.size
+        self.vectors[row] = vector
+        self.importance[row] = importance
+        self.timestamps[row] = timestamp
+        self.ids[row] = item_id
+        self._rows[item_id] = row
+        self.size += 1
+
+    def bulk_load(self,
+                  ids: np.ndarray,
+                  vectors: np.ndarray,
+                  importance: np.ndarray,
+                  timestamps: np.ndarray) -> None:
+        """Replace the index contents with whole columns in one copy"""
+        n = len(ids)
+        capacity = max(n, 1024)
+        self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self.importance = np.zeros(capacity, dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vectors[:n] = vectors
+        self.importance[:n] = importance
+        self.timestamps[:n] = timestamps
+        self.ids[:n] = ids
+        self._rows = dict(zip(self.ids[:n].tolist(), range(n)))
+        self.size = n
+
+    def get(self, item_ids: List[int]) -> np.ndarray:
+        """Stored vectors for the given ids, one row each"""
+        rows = [self._rows[item_id] for item_id in item_ids]
+        return self.vectors[rows]
+
+    def remove(self, item_id: int) -> None:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.importance[row] = self.importance[last]
+            self.timestamps[row] = self.timestamps[last]
+            self.ids[row] = self.ids[last]
+            self._rows[int(self.ids[row])] = row
+        self.size = last
+
+    def clear(self) -> None:
+        self.size = 0
+        self._rows.clear()
+
+    def search(self,
+               query: np.ndarray,
+               k: int,
+               now: float,
+               similarity_weight: float = 0.6,
+               importance_weight: float = 0.3,
+               recency_weight: float = 0.1,
+               recency_half_life: float = 3600.0) -> List[Tuple[int, float]]:
+        """Top-k (id, score) by blended similarity, importance and recency"""
+        if self.size == 0 or k <= 0:
+            return []
+        n = self.size
+        scores = self.vectors[:n] @ query
+        scores *= similarity_weight
+        scores += importance_weight * self.importance[:n]
+        if recency_weight:
+            age = np.maximum(now - self.timestamps[:n], 0.0)
+            scores += (recency_weight * np.exp2(-age / recency_half_life)).astype(np.float32)
+
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.ids[row]), float(scores[row])) for row in top]
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._rows
+
+    def __len__(self) -> int:
+        return self.size
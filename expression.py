@@ -0,0 +1,203 @@
+from typing import Any, Callable, Dict, Mapping, Optional
+from functools import lru_cache, reduce
+import ast
+import math
+import operator
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 1000
+MAX_NODES = 200
+MAX_INT_BITS = 4096
+MAX_BATCH_ELEMENTS = 10_000_000
+# round() computes 10 ** abs(ndigits) internally, so ndigits is clamped
+MAX_ROUND_DIGITS = 20
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are invalid, unsupported or too expensive"""
+
+def _round_digits(ndigits: Any) -> int:
+    if isinstance(ndigits, bool) or not isinstance(ndigits, (int, np.integer)):
+        raise ExpressionError("round() digits must be an integer")
+    return max(-MAX_ROUND_DIGITS, min(MAX_ROUND_DIGITS, int(ndigits)))
+
+def _safe_round(value: Any, ndigits: Any = None) -> Any:
+    if ndigits is None:
+        return round(value)
+    return round(value, _round_digits(ndigits))
+
+def _safe_array_round(values: Any, decimals: Any = 0) -> Any:
+    return np.round(values, _round_digits(decimals))
+
+_SCALAR_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": _safe_round,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+
+def _fold(ufunc: np.ufunc) -> Callable[..., Any]:
+    """N-ary elementwise min/max; the binary ufuncs would read a third argument as ``out``"""
+    def fold(*args: Any) -> Any:
+        if len(args) < 2:
+            raise ExpressionError("min and max need at least two arguments")
+        return reduce(ufunc, args)
+    return fold
+
+_ARRAY_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "abs": np.abs,
+    "min": _fold(np.minimum),
+    "max": _fold(np.maximum),
+    "round": _safe_array_round,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+}
+
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+def _check_int(value: Any) -> Any:
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ExpressionError("Intermediate result is too large")
+    return value
+
+def _safe_pow(base: Any, exponent: Any) -> Any:
+    """Power that refuses results too large to compute cheaply"""
+    if isinstance(base, np.ndarray) or isinstance(exponent, np.ndarray):
+        return np.power(np.asarray(base, dtype=np.float64), exponent)
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * (abs(base).bit_length() - 1) > MAX_INT_BITS:
+            raise ExpressionError("Exponent is too large")
+    try:
+        result = _check_int(base ** exponent)
+    except OverflowError:
+        raise ExpressionError("Result is too large")
+    if isinstance(result, complex):
+        raise ExpressionError("Result is not a real number")
+    return result
+
+def _safe_mul(left: Any, right: Any) -> Any:
+    return _check_int(operator.mul(left, right))
+
+_BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: lambda a, b: _check_int(a + b),
+    ast.Sub: lambda a, b: _check_int(a - b),
+    ast.Mult: _safe_mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow,
+}
+
+_UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+Compiled = Callable[[Mapping[str, Any], Mapping[str, Callable[..., Any]]], Any]
+
+def _compile_node(node: ast.AST) -> Compiled:
+    """Turn a whitelisted AST node into a closure over (variables, functions)"""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Unsupported constant: {node.value!r}")
+        value = node.value
+        return lambda variables, functions: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in _CONSTANTS:
+            constant = _CONSTANTS[name]
+            return lambda variables, functions: variables.get(name, constant)
+
+        def load(variables: Mapping[str, Any], functions: Mapping[str, Callable[..., Any]]) -> Any:
+            try:
+                return variables[name]
+            except KeyError:
+                raise ExpressionError(f"Unknown variable: {name}")
+        return load
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda variables, functions: op(left(variables, functions), right(variables, functions))
+
+    if isinstance(node, ast.UnaryOp):
+        unary = _UNARY_OPERATORS.get(type(node.op))
+        if unary is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        operand = _compile_node(node.operand)
+        return lambda variables, functions: unary(operand(variables, functions))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _SCALAR_FUNCTIONS:
+            raise ExpressionError("Unsupported function call")
+        if node.keywords:
+            raise ExpressionError("Keyword arguments are not supported")
+        name = node.func.id
+        args = [_compile_node(arg) for arg in node.args]
+        return lambda variables, functions: functions[name](*(arg(variables, functions) for arg in args))
+
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> Compiled:
+    """Parse, validate and compile an expression once; results are cached"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError("Expression is too long")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}")
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ExpressionError("Expression is too complex")
+    return _compile_node(tree)
+
+def evaluate(expression: str, variables: Optional[Mapping[str, Any]] = None) -> Any:
+    """Evaluate an arithmetic expression with optional scalar variables"""
+    compiled = compile_expression(expression)
+    try:
+        return compiled(variables or {}, _SCALAR_FUNCTIONS)
+    except ExpressionError:
+        raise
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise ExpressionError(str(e))
+
+def evaluate_batch(expression: str, bindings: Mapping[str, Any]) -> np.ndarray:
+    """Evaluate one expression over arrays of variable bindings, vectorized with NumPy"""
+    arrays = {name: np.asarray(values, dtype=np.float64) for name, values in bindings.items()}
+    # Scalars and equal-length 1-D arrays only, so broadcasting can't grow
+    # the result past the size of the inputs
+    lengths = {array.size for array in arrays.values() if array.ndim == 1}
+    if any(array.ndim > 1 for array in arrays.values()) or len(lengths) > 1:
+        raise ExpressionError("Bindings must be scalars or 1-D arrays of equal length")
+    if sum(array.size for array in arrays.values()) > MAX_BATCH_ELEMENTS:
+        raise ExpressionError("Batch is too large")
+    compiled = compile_expression(expression)
+    with np.errstate(all="ignore"):
+        try:
+            result = compiled(arrays, _ARRAY_FUNCTIONS)
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e))
+    return np.asarray(result, dtype=np.float64)
@@ -0,0 +1,90 @@
+from typing import Any, List, Optional
+import asyncio
+import hashlib
+import random
+import time
+
+_WORDS = (
+    "the agent considers your interests and location to suggest relevant topics "
+    "memory context helps refine this answer with recent preferences and history"
+).split()
+
+class FakeResponse:
+    """Stand-in for a Gemini response or stream chunk"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeStream:
+    """Async iterator over FakeResponse chunks"""
+
+    def __init__(self, chunks: List[str], delay: float):
+        self._chunks = list(chunks)
+        self._delay = delay
+
+    def __aiter__(self) -> "FakeStream":
+        return self
+
+    async def __anext__(self) -> FakeResponse:
+        if not self._chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delay)
+        return FakeResponse(self._chunks.pop(0))
+
+class FakeGenerativeModel:
+    """Deterministic, offline stand-in for genai.GenerativeModel.
+
+    Output text depends only on the prompt and seed. Latency is
+    ``latency`` plus up to ``jitter`` seconds, drawn from a seeded RNG.
+    Inject it with ``PerceptionLayer(model=FakeGenerativeModel())``.
+    """
+
+    def __init__(self,
+                 latency: float = 0.2,
+                 jitter: float = 0.05,
+                 output_tokens: int = 200,
+                 chunk_tokens: int = 20,
+                 seed: int = 0,
+                 model_name: str = "fake-gemini"):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.model_name = model_name
+        self.calls = 0
+        self._seed = seed
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        return self.latency + (self._rng.uniform(0.0, self.jitter) if self.jitter else 0.0)
+
+    def _tokens(self, prompt: Any) -> List[str]:
+        digest = hashlib.sha256(f"{self._seed}:{prompt}".encode("utf-8")).digest()
+        start = int.from_bytes(digest[:4], "little")
+        return [_WORDS[(start + i * 7) % len(_WORDS)] for i in range(self.output_tokens)]
+
+    def _chunks(self, prompt: Any) -> List[str]:
+        tokens = self._tokens(prompt)
+        return [
+            " ".join(tokens[i:i + self.chunk_tokens]) + (" " if i + self.chunk_tokens < len(tokens) else "")
+            for i in range(0, len(tokens), self.chunk_tokens)
+        ]
+
+    async def generate_content_async(self,
+                                     contents: Any,
+                                     generation_config: Optional[Any] = None,
+                                     stream: bool = False) -> Any:
+        self.calls += 1
+        delay = self._delay()
+        if stream:
+            chunks = self._chunks(contents)
+            # Time to first token is a share of the total latency
+            await asyncio.sleep(delay / 4)
+            return FakeStream(chunks, (delay * 3 / 4) / max(1, len(chunks)))
+        await asyncio.sleep(delay)
+        return FakeResponse(" ".join(self._tokens(contents)))
+
+    def generate_content(self, contents: Any, generation_config: Optional[Any] = None) -> FakeResponse:
+        self.calls += 1
+        time.sleep(self._delay())
+        return FakeResponse(" ".join(self._tokens(contents)))
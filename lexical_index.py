@@ -0,0 +1,103 @@
+from typing import Dict, List, Tuple, Any
+from collections import Counter, deque
+import heapq
+import math
+import time
+from embeddings import tokenize
+
+class BM25Index:
+    """Incremental inverted index with BM25 scoring.
+
+    Postings are updated on every add/remove, and a query only touches the
+    postings of its own terms, never the whole collection.
+    """
+
+    def __init__(self,
+                 k1: float = 1.5,
+                 b: float = 0.75,
+                 max_df_ratio: float = 0.5,
+                 min_common_df: int = 64,
+                 latency_window: int = 1000):
+        self.k1 = k1
+        self.b = b
+        # Terms in more than this share of documents carry little signal; their
+        # postings are never walked, so a query of only common terms matches nothing
+        self.max_df_ratio = max_df_ratio
+        # Postings this short are cheap to walk, so small collections still match
+        self.min_common_df = min_common_df
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._latencies: deque = deque(maxlen=latency_window)
+        self.queries = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        if doc_id in self._doc_terms:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self._doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        for term, freq in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = freq
+
+    def remove(self, doc_id: int) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (doc_id, score) for the query terms"""
+        start = time.perf_counter()
+        n_docs = len(self._doc_lengths)
+        scores: Dict[int, float] = {}
+        if n_docs and k > 0:
+            avg_length = self._total_length / n_docs
+            max_df = max(self.max_df_ratio * n_docs, self.min_common_df)
+            rare = [
+                postings for postings in map(self._postings.get, set(tokenize(query)))
+                if postings is not None and len(postings) <= max_df
+            ]
+            for postings in rare:
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        results = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        self._latencies.append(time.perf_counter() - start)
+        self.queries += 1
+        return results
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """Query latency over the recent window, in milliseconds"""
+        if not self._latencies:
+            return {"queries": self.queries, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self._latencies)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        return {
+            "queries": self.queries,
+            "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95),
+            "max_ms": ordered[-1] * 1000,
+        }
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._doc_terms
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
@@ -1,10 +1,12 @@
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Union
 from pydantic import BaseModel, Field
-from perception import PerceptionLayer, UserPreferences
+from perception import PerceptionLayer, PerceptionResponse, UserPreferences
 from memory import MemoryLayer
-from decision_making import DecisionLayer, ActionType
+from decision_making import DecisionLayer, DecisionContext, ActionType
 from action import ActionLayer
+from pipeline import Stage, StageGraph
+from telemetry import Span, collect_spans, metrics
 
 class AgentResponse(BaseModel):
     """Model for agent's response"""
@@ -13,14 +15,20 @@ class AgentResponse(BaseModel):
     reasoning_chain: list[str]
     execution_time: float = Field(ge=0.0)
     model_used: str = "gemini-2.0-flash"
+    stage_timings: Dict[str, float] = Field(default_factory=dict)
+    spans: List[Span] = Field(default_factory=list)
 
 class CognitiveAgent:
-    def __init__(self):
-        self.perception = PerceptionLayer()
+    def __init__(self, perception: Optional[PerceptionLayer] = None):
+        self.perception = perception or PerceptionLayer()
         self.memory = MemoryLayer()
         self.decision = DecisionLayer()
         self.action = ActionLayer()
         self.user_preferences = None
+        # Memory writes run off the critical path; retrieval waits for them
+        self._pending_writes: Set[asyncio.Task] = set()
+        # Created by the first snapshot() or by restore(); see snapshot.py
+        self._snapshotter = None
 
     async def set_user_preferences(self, preferences: UserPreferences) -> None:
         """Set user preferences and initialize the agent"""
@@ -36,45 +44,149 @@ class CognitiveAgent:
 
     async def process(self, input_text: str) -> AgentResponse:
         """Process input through all cognitive layers"""
+        return await self._run_pipeline(
+            input_text, lambda memories: self.perception.process_input(input_text, memories)
+        )
+
+    async def process_stream(self, input_text: str) -> AsyncIterator[Union[str, AgentResponse]]:
+        """Stream perception text chunks, then yield the final AgentResponse.
+
+        The stream starts once memories are retrieved; decision and action
+        run once perception has finished, exactly as in process().
+        """
+        loop = asyncio.get_running_loop()
+        retrieved: asyncio.Future = loop.create_future()
+        perception_result: asyncio.Future = loop.create_future()
+
+        def perceive(memories: List[str]) -> Awaitable[PerceptionResponse]:
+            retrieved.set_result(memories)
+            return perception_result
+
+        pipeline = asyncio.ensure_future(self._run_pipeline(input_text, perceive))
+
+        try:
+            await asyncio.wait({retrieved, pipeline}, return_when=asyncio.FIRST_COMPLETED)
+            if not retrieved.done():
+                # Retrieval failed; surface its error
+                await pipeline
+            async for item in self.perception.process_input_stream(input_text, retrieved.result()):
+                if isinstance(item, PerceptionResponse):
+                    perception_result.set_result(item)
+                else:
+                    yield item
+        except BaseException:
+            pipeline.cancel()
+            raise
+
+        yield await pipeline
+
+    async def drain(self) -> None:
+        """Wait for background memory writes to finish"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def snapshot(self, full: bool = False) -> bytes:
+        """Binary snapshot of the session; after the first, a delta unless full is set.
+
+        Call drain() first so background memory writes are included.
+        """
+        from snapshot import AgentSnapshotter
+        if self._snapshotter is None:
+            self._snapshotter = AgentSnapshotter(self)
+        return self._snapshotter.snapshot(full)
+
+    @classmethod
+    def restore(cls, data: bytes, perception: Optional[PerceptionLayer] = None) -> "CognitiveAgent":
+        """Rebuild an agent from snapshot() output: a full snapshot plus any later deltas"""
+        from snapshot import restore_agent
+        return restore_agent(data, cls(perception))
+
+    def apply_snapshot(self, data: bytes) -> None:
+        """Apply deltas that continue this agent's snapshot sequence"""
+        from snapshot import restore_agent
+        restore_agent(data, self)
+
+    async def _run_pipeline(self,
+                            input_text: str,
+                            perceive: Callable[[List[str]], Awaitable[PerceptionResponse]]) -> AgentResponse:
+        """Run the cognitive layers as a stage graph.
+
+        memory_retrieve ──> perception ──┬──> memory_write ──> memory_consolidate (background)
+               └─────────────────────────┴──> decision ──> action
+
+        perceive receives the retrieved memory contents for the prompt.
+        """
         start_time = asyncio.get_event_loop().time()
 
-        # 1. Perception Layer
-        perception_result = await self.perception.process_input(input_text)
-        
-        # 2. Memory Layer
-        memory_result = self.memory.retrieve_relevant_memories(input_text)
-        self.memory.add_memory(
-            perception_result.processed_input,
-            {
-                "confidence": perception_result.confidence_score,
+        async def retrieve(_: Dict[str, Any]):
+            # Earlier turns' writes must be visible, the current turn's must not
+            await self.drain()
+            return self.memory.retrieve_relevant_memories(input_text)
+
+        def write(results: Dict[str, Any]) -> None:
+            perception_result = results["perception"]
+            self.memory.add_memory(
+                perception_result.processed_input,
+                {
+                    "confidence": perception_result.confidence_score,
+                    "model": "gemini-2.0-flash"
+                },
+                importance=0.7
+            )
+
+        def decide(results: Dict[str, Any]):
+            context = DecisionContext({
+                "perception": results["perception"].model_dump(),
+                "memory": results["memory_retrieve"].model_dump(),
+                "user_preferences": self.user_preferences.model_dump() if self.user_preferences else {},
                 "model": "gemini-2.0-flash"
-            },
-            importance=0.7
-        )
-        
-        # 3. Decision Layer
-        context = {
-            "perception": perception_result.model_dump(),
-            "memory": memory_result.model_dump(),
-            "user_preferences": self.user_preferences.model_dump() if self.user_preferences else {},
-            "model": "gemini-2.0-flash"
-        }
-        
-        decision_result = self.decision.evaluate_options(
-            context=context,
-            available_actions=list(ActionType)
+            })
+            return self.decision.evaluate_options(
+                context=context,
+                available_actions=list(ActionType)
+            )
+
+        graph = StageGraph([
+            # 1. Perception Layer
+            Stage("perception",
+                  lambda results: perceive([m.content for m in results["memory_retrieve"].relevant_memories]),
+                  deps=["memory_retrieve"]),
+            # 2. Memory Layer
+            Stage("memory_retrieve", retrieve),
+            Stage("memory_write", write, deps=["perception"], critical=False),
+            Stage("memory_consolidate", lambda _: self.memory.consolidate(), deps=["memory_write"], critical=False),
+            # 3. Decision Layer
+            Stage("decision", decide, deps=["perception", "memory_retrieve"]),
+            # 4. Action Layer
+            Stage("action", lambda results: self.action.execute_top_k(results["decision"].decisions),
+                  deps=["decision"]),
+        ])
+        with collect_spans() as collector:
+            results, timings, background = await graph.run()
+            spans = list(collector.spans)
+        metrics.record_turn(spans)
+        metrics.inc("agent_turns_total")
+        metrics.set_gauge("memory_entries", len(self.memory.store))
+        for task in background:
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+        decision_result = results["decision"]
+        action_result = results["action"]
+        # With top-k execution the action that ran may not be final_action
+        chosen = next(
+            (d for d in decision_result.decisions if d.action_type == action_result.action_type),
+            decision_result.final_action
         )
-        
-        # 4. Action Layer
-        action_result = await self.action.execute_action(decision_result.final_action)
-        
         execution_time = asyncio.get_event_loop().time() - start_time
         
         return AgentResponse(
             output=action_result.output,
-            confidence=decision_result.final_action.confidence,
+            confidence=chosen.confidence,
             reasoning_chain=decision_result.reasoning_chain,
-            execution_time=execution_time
+            execution_time=execution_time,
+            stage_timings=timings,
+            spans=spans
         )
 
 async def main():
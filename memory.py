@@ -1,6 +1,14 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from memory_store import BoundedMemoryStore, MetadataPool
+from embeddings import Embedder, HashingEmbedder, VectorIndex
+from lexical_index import BM25Index
+from memory_persistence import PersistentMemoryBackend
+from context_builder import DEFAULT_SUMMARY_TOKENS, pack_texts
+from consolidation import MemoryConsolidator
+import sys
+import time
 
 class MemoryEntry(BaseModel):
     """Model for a single memory entry"""
@@ -16,43 +24,219 @@ class MemoryResponse(BaseModel):
     confidence_score: float = Field(ge=0.0, le=1.0)
 
 class MemoryLayer:
-    def __init__(self):
-        self.memories: List[MemoryEntry] = []
-        self.max_memories: int = 1000  # Maximum number of memories to store
+    def __init__(self,
+                 max_memories: int = 1000,
+                 semantic: bool = True,
+                 embedder: Optional[Embedder] = None,
+                 similarity_weight: float = 0.6,
+                 importance_weight: float = 0.3,
+                 recency_weight: float = 0.1,
+                 recency_half_life: float = 3600.0,
+                 lexical: bool = True,
+                 persist_path: Optional[str] = None,
+                 fsync: str = "batch",
+                 write_batch_size: int = 64,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+                 consolidate: bool = True):
+        # Keeps the most important, most recent memories within max_memories.
+        # Memories are stored as columns plus a (content, metadata ref) payload;
+        # MemoryEntry objects are only built for the entries that are returned.
+        self.store: BoundedMemoryStore[Tuple[str, int]] = BoundedMemoryStore(max_memories)
+        self.metadata_pool = MetadataPool()
+
+        # Semantic retrieval blends query similarity with importance and recency;
+        # with semantic=False retrieval ranks by importance and recency only
+        self.embedder: Optional[Embedder] = (embedder or HashingEmbedder()) if semantic else None
+        self.vector_index = VectorIndex(self.embedder.dim) if self.embedder else None
+        self.similarity_weight = similarity_weight
+        self.importance_weight = importance_weight
+        self.recency_weight = recency_weight
+        self.recency_half_life = recency_half_life
+        # Token budget for context_summary, which feeds decision reasoning
+        self.summary_tokens = summary_tokens
+
+        # Keyword index for exact-term lookups (names, locations, IDs)
+        self.lexical_index = BM25Index() if lexical else None
+        self._lexical_stale = False
+
+        # Merges near-duplicates and summarizes cold memories in small steps
+        self.consolidator: Optional[MemoryConsolidator] = MemoryConsolidator(self) if consolidate else None
+
+        # Optional durable backend; existing memories are mapped, not deserialized
+        self.backend: Optional[PersistentMemoryBackend] = None
+        if persist_path:
+            self.backend = PersistentMemoryBackend(
+                persist_path,
+                embedding_dim=self.embedder.dim if self.embedder else None,
+                fsync=fsync,
+                batch_size=write_batch_size
+            )
+            self._load_from_backend()
+
+    def _load_from_backend(self) -> None:
+        """Rebuild the in-memory indexes from the backend's mapped columns"""
+        ids = self.backend.live_ids()
+        importance = self.backend.importance[ids]
+        timestamps = self.backend.timestamps[ids]
+        # Payloads stay unloaded (None) until the entry is retrieved
+        evicted = self.store.bulk_load(ids, importance, timestamps)
+        self.store.next_id = self.backend.next_id
+        if self.vector_index is not None and self.backend.embeddings is not None:
+            self.vector_index.bulk_load(ids, self.backend.embeddings[ids], importance, timestamps)
+        # Rebuilt on the first keyword query rather than at startup
+        self._lexical_stale = self.lexical_index is not None and len(ids) > 0
+        self._forget(evicted)
+
+    def _ensure_lexical_index(self) -> None:
+        if not self._lexical_stale:
+            return
+        self.lexical_index.clear()
+        if self.backend is not None:
+            contents = self.backend.iter_contents()
+        else:
+            contents = ((memory_id, payload[0]) for memory_id, payload in self.store.items())
+        for memory_id, content in contents:
+            if memory_id in self.store:
+                self.lexical_index.add(memory_id, content)
+        self._lexical_stale = False
+
+    def _payload(self, memory_id: int) -> Tuple[str, int]:
+        """(content, metadata ref) of a stored memory, loading it from the backend if needed"""
+        payload = self.store.get(memory_id)
+        if payload is None and self.backend is not None:
+            content, metadata, _, _ = self.backend.load_entry(memory_id)
+            payload = (content, self.metadata_pool.intern(metadata))
+            self.store.replace(memory_id, payload)
+        return payload
+
+    def _entry(self, memory_id: int) -> MemoryEntry:
+        """Materialize a stored memory, loading its payload from the backend if needed"""
+        content, metadata_ref = self._payload(memory_id)
+        return MemoryEntry.model_construct(
+            content=content,
+            metadata=self.metadata_pool.get(metadata_ref),
+            importance=round(self.store.importance(memory_id), 6),
+            timestamp=datetime.fromtimestamp(self.store.timestamp(memory_id))
+        )
+
+    @property
+    def max_memories(self) -> int:
+        """Maximum number of memories to store"""
+        return self.store.max_entries
+
+    @max_memories.setter
+    def max_memories(self, value: int) -> None:
+        self._forget(self.store.resize(value))
+
+    @property
+    def memories(self) -> List[MemoryEntry]:
+        """All stored memories in insertion order"""
+        return [self._entry(memory_id) for memory_id, _ in self.store.items()]
 
     def add_memory(self, content: str, metadata: Optional[Dict[str, Any]] = None, importance: float = 0.5) -> None:
         """Add a new memory entry"""
         if metadata is None:
             metadata = {}
-        
-        new_memory = MemoryEntry(
-            content=content,
-            metadata=metadata,
-            importance=importance
+        if not 0.0 <= importance <= 1.0:
+            raise ValueError(f"importance must be between 0 and 1, got {importance}")
+        self._insert(content, metadata, importance, time.time())
+
+    def _insert(self, content: str, metadata: Dict[str, Any], importance: float, timestamp: float) -> Optional[int]:
+        """Store a memory and index it; return its id, or None if it was evicted at once"""
+        payload = (sys.intern(content), self.metadata_pool.intern(metadata))
+
+        # Evicts the least important, oldest memory once the limit is reached
+        memory_id, evicted = self.store.add(payload, importance, timestamp)
+
+        self._forget(evicted)
+        if memory_id in self.store:
+            vector = None
+            if self.vector_index is not None:
+                vector = self.embedder.embed([content])[0]
+                self.vector_index.add(memory_id, vector, importance, timestamp)
+            if self.lexical_index is not None:
+                self.lexical_index.add(memory_id, content)
+            if self.backend is not None:
+                self.backend.append(memory_id, content, metadata, importance, timestamp, vector)
+            return memory_id
+        return None
+
+    def remove_memories(self, memory_ids: List[int]) -> None:
+        """Delete memories by id from the store, indexes and backend"""
+        self._forget([
+            (memory_id, self.store.remove(memory_id)) for memory_id in memory_ids if memory_id in self.store
+        ])
+
+    def consolidate(self) -> Dict[str, int]:
+        """Count a turn, running a bounded consolidation step every few turns; return what it did"""
+        if self.consolidator is None:
+            return {}
+        return self.consolidator.tick()
+
+    def _forget(self, evicted: List[Tuple[int, Optional[Tuple[str, int]]]]) -> None:
+        """Drop evicted memories from the retrieval indexes and backend"""
+        for memory_id, payload in evicted:
+            if payload is not None:
+                self.metadata_pool.release(payload[1])
+            if self.vector_index is not None:
+                self.vector_index.remove(memory_id)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(memory_id)
+            if self.consolidator is not None:
+                self.consolidator.discard(memory_id)
+        if self.backend is not None:
+            self.backend.delete([memory_id for memory_id, _ in evicted])
+
+    def _dense_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k memory ids by blended similarity, importance and recency"""
+        return self.vector_index.search(
+            self.embedder.embed([query])[0],
+            k,
+            now=time.time(),
+            similarity_weight=self.similarity_weight,
+            importance_weight=self.importance_weight,
+            recency_weight=self.recency_weight,
+            recency_half_life=self.recency_half_life
         )
-        
-        self.memories.append(new_memory)
-        
-        # Maintain memory limit
-        if len(self.memories) > self.max_memories:
-            self.memories = sorted(self.memories, key=lambda x: (x.importance, x.timestamp), reverse=True)
-            self.memories = self.memories[:self.max_memories]
+
+    @staticmethod
+    def _fuse(rankings: List[List[Tuple[int, float]]], k: int) -> List[Tuple[int, float]]:
+        """Reciprocal rank fusion"""
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (memory_id, _) in enumerate(ranking):
+                fused[memory_id] = fused.get(memory_id, 0.0) + 1.0 / (60 + rank)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
 
     def retrieve_relevant_memories(self, query: str, max_results: int = 5) -> MemoryResponse:
         """Retrieve memories relevant to the query"""
-        # Sort memories by importance and recency
-        sorted_memories = sorted(
-            self.memories,
-            key=lambda x: (x.importance, x.timestamp),
-            reverse=True
-        )
+        self._ensure_lexical_index()
+        if self.vector_index is not None:
+            if self.lexical_index is not None:
+                # Reciprocal rank fusion of dense and keyword rankings
+                candidates = max_results * 2
+                ranked = self._fuse(
+                    [self._dense_search(query, candidates), self.lexical_index.search(query, candidates)],
+                    max_results
+                )
+            else:
+                ranked = self._dense_search(query, max_results)
+            relevant_memories = [self._entry(memory_id) for memory_id, _ in ranked]
+        elif self.lexical_index is not None and query.strip():
+            ranked = self.lexical_index.search(query, max_results)
+            relevant_memories = [self._entry(memory_id) for memory_id, _ in ranked]
+            if len(relevant_memories) < max_results:
+                seen = {memory_id for memory_id, _ in ranked}
+                relevant_memories += [
+                    self._entry(memory_id) for memory_id, _ in self.store.top_k(max_results * 2)
+                    if memory_id not in seen
+                ][:max_results - len(relevant_memories)]
+        else:
+            # Most important, most recent memories regardless of the query
+            relevant_memories = [self._entry(memory_id) for memory_id, _ in self.store.top_k(max_results)]
         
-        # For now, return the most recent and important memories
-        # In a real implementation, this would use semantic search
-        relevant_memories = sorted_memories[:max_results]
-        
-        # Create a summary of the context
-        context_summary = " ".join([mem.content for mem in relevant_memories])
+        # Create a summary of the context, most relevant first, within the token budget
+        context_summary = " ".join(pack_texts((mem.content for mem in relevant_memories), self.summary_tokens))
         
         return MemoryResponse(
             relevant_memories=relevant_memories,
@@ -62,4 +246,25 @@ class MemoryLayer:
 
     def clear_memories(self) -> None:
         """Clear all stored memories"""
-        self.memories = [] 
\ No newline at end of file
+        self.store.clear()
+        self.metadata_pool.clear()
+        if self.vector_index is not None:
+            self.vector_index.clear()
+        if self.lexical_index is not None:
+            self.lexical_index.clear()
+            self._lexical_stale = False
+        if self.consolidator is not None:
+            self.consolidator.reset()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def flush(self) -> None:
+        """Write buffered memories to the persistent backend"""
+        if self.backend is not None:
+            self.backend.flush()
+
+    def close(self) -> None:
+        """Flush and close the persistent backend"""
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
\ No newline at end of file
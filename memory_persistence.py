@@ -0,0 +1,212 @@
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import numpy as np
+
+FSYNC_POLICIES = ("always", "batch", "never")
+
+class PersistentMemoryBackend:
+    """Durable memory storage: SQLite for entry text and metadata, memory-mapped
+    arrays for the numeric columns.
+
+    Layout of ``path``:
+      memories.sqlite  - id, content, metadata (JSON)
+      timestamps.f64   - float64 per memory id
+      importance.f32   - float32 per memory id
+      live.u8          - 1 while the memory is stored, 0 once evicted
+      embeddings.f32   - float32 [id, dim] (only when an embedder is used)
+      meta.json        - schema version, next id and embedding dimension
+
+    Reopening maps the arrays instead of reading rows, so no per-entry objects
+    are built until an entry is actually requested.
+
+    Writes are buffered and flushed every ``batch_size`` operations. ``fsync``
+    controls durability: "always" syncs every write, "batch" syncs on each
+    flush and "never" leaves it to the OS.
+    """
+
+    VERSION = 1
+
+    def __init__(self,
+                 path: str,
+                 embedding_dim: Optional[int] = None,
+                 fsync: str = "batch",
+                 batch_size: int = 64):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fsync = fsync
+        self.batch_size = 1 if fsync == "always" else max(1, batch_size)
+
+        self.meta = self._read_meta()
+        if self.meta is None:
+            self.meta = {"version": self.VERSION, "next_id": 0, "embedding_dim": embedding_dim}
+        elif self.meta["version"] != self.VERSION:
+            raise ValueError(f"Unsupported memory store version: {self.meta['version']}")
+        elif embedding_dim is not None and self.meta["embedding_dim"] not in (None, embedding_dim):
+            raise ValueError(
+                f"Store at {path} has embedding dimension {self.meta['embedding_dim']}, got {embedding_dim}"
+            )
+        self.embedding_dim: Optional[int] = self.meta["embedding_dim"] or embedding_dim
+        self.meta["embedding_dim"] = self.embedding_dim
+
+        self.db = sqlite3.connect(os.path.join(path, "memories.sqlite"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "PRAGMA synchronous=" + {"always": "FULL", "batch": "NORMAL", "never": "OFF"}[fsync]
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS memories "
+            "(id INTEGER PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self.db.commit()
+
+        self.next_id: int = self.meta["next_id"]
+        self._capacity = 0
+        self._map_arrays(max(1024, self.next_id))
+        self._pending_rows: List[Tuple[int, str, str]] = []
+        self._pending_deletes: List[int] = []
+        self._dirty = False
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self) -> None:
+        self.meta["next_id"] = self.next_id
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+            if self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    def _map(self, name: str, dtype: Any, shape: Tuple[int, ...]) -> np.memmap:
+        file_path = os.path.join(self.path, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _map_arrays(self, capacity: int) -> None:
+        if self._capacity:
+            self._flush_arrays()
+        self._capacity = capacity
+        self.timestamps = self._map("timestamps.f64", np.float64, (capacity,))
+        self.importance = self._map("importance.f32", np.float32, (capacity,))
+        self.live = self._map("live.u8", np.uint8, (capacity,))
+        self.embeddings = (
+            self._map("embeddings.f32", np.float32, (capacity, self.embedding_dim))
+            if self.embedding_dim else None
+        )
+
+    def append(self,
+               memory_id: int,
+               content: str,
+               metadata: Dict[str, Any],
+               importance: float,
+               timestamp: float,
+               vector: Optional[np.ndarray] = None) -> None:
+        """Record a new memory; ids must be allocated in increasing order"""
+        if memory_id >= self._capacity:
+            self._map_arrays(max(self._capacity * 2, memory_id + 1))
+        self.timestamps[memory_id] = timestamp
+        self.importance[memory_id] = importance
+        self.live[memory_id] = 1
+        if self.embeddings is not None and vector is not None:
+            self.embeddings[memory_id] = vector
+        self.next_id = max(self.next_id, memory_id + 1)
+        self._pending_rows.append((memory_id, content, json.dumps(metadata, default=str)))
+        self._dirty = True
+        self._maybe_flush()
+
+    def delete(self, memory_ids: List[int]) -> None:
+        """Mark memories as evicted"""
+        for memory_id in memory_ids:
+            if memory_id < self._capacity:
+                self.live[memory_id] = 0
+            self._pending_deletes.append(memory_id)
+        if memory_ids:
+            self._dirty = True
+            self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending_rows) + len(self._pending_deletes) >= self.batch_size:
+            self.flush()
+
+    def _flush_arrays(self) -> None:
+        for array in (self.timestamps, self.importance, self.live, self.embeddings):
+            if array is not None:
+                array.flush()
+
+    def flush(self) -> None:
+        """Write buffered entries, then the arrays, then the header"""
+        if not self._dirty:
+            return
+        if self._pending_rows:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO memories (id, content, metadata) VALUES (?, ?, ?)",
+                self._pending_rows
+            )
+        if self._pending_deletes:
+            self.db.executemany(
+                "DELETE FROM memories WHERE id = ?", [(memory_id,) for memory_id in self._pending_deletes]
+            )
+        self.db.commit()
+        self._pending_rows.clear()
+        self._pending_deletes.clear()
+        if self.fsync != "never":
+            self._flush_arrays()
+        self._write_meta()
+        self._dirty = False
+
+    def live_ids(self) -> np.ndarray:
+        """Ids of stored memories, read straight from the live mask"""
+        return np.flatnonzero(self.live[:self.next_id])
+
+    def load_entry(self, memory_id: int) -> Optional[Tuple[str, Dict[str, Any], float, float]]:
+        """(content, metadata, importance, timestamp) for one memory"""
+        for pending_id, content, metadata in reversed(self._pending_rows):
+            if pending_id == memory_id:
+                break
+        else:
+            row = self.db.execute(
+                "SELECT content, metadata FROM memories WHERE id = ?", (memory_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            content, metadata = row
+        return (
+            content,
+            json.loads(metadata),
+            round(float(self.importance[memory_id]), 6),
+            float(self.timestamps[memory_id]),
+        )
+
+    def iter_contents(self) -> Iterator[Tuple[int, str]]:
+        """(id, content) for every stored memory, without building entries"""
+        self.flush()
+        yield from self.db.execute("SELECT id, content FROM memories ORDER BY id")
+
+    def clear(self) -> None:
+        """Remove every memory from disk"""
+        self._pending_rows.clear()
+        self._pending_deletes.clear()
+        self.db.execute("DELETE FROM memories")
+        self.db.commit()
+        self.live[:] = 0
+        self.next_id = 0
+        self._dirty = True
+        self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._flush_arrays()
+        self.db.close()
@@ -0,0 +1,288 @@
+from typing import Any, Dict, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import heapq
+import json
+import sys
+import numpy as np
+
+T = TypeVar("T")
+
+# Heap keys pack (importance, timestamp, id) into one int so ordering needs no
+# per-entry tuple: 24 bits of importance, 56 bits of microseconds, 40 bits of id
+_IMPORTANCE_SCALE = (1 << 24) - 1
+_ID_BITS = 40
+_TIME_BITS = 56
+_ID_MASK = (1 << _ID_BITS) - 1
+_TIME_MASK = (1 << _TIME_BITS) - 1
+
+def _heap_key(importance: float, timestamp: float, item_id: int) -> int:
+    importance_bits = int(round(min(max(importance, 0.0), 1.0) * _IMPORTANCE_SCALE))
+    time_bits = int(round(timestamp * 1_000_000)) & _TIME_MASK
+    return (importance_bits << (_TIME_BITS + _ID_BITS)) | (time_bits << _ID_BITS) | item_id
+
+class BoundedMemoryStore(Generic[T]):
+    """Fixed-capacity columnar store that keeps the highest (importance, timestamp) items.
+
+    Importance and timestamps live in NumPy columns indexed by slot, payloads in
+    a plain list, and freed slots are reused. Two heaps of packed int keys index
+    the live items: a min-heap finds the eviction victim and a max-heap serves
+    top-k queries. Removed items are deleted lazily from the heaps, which are
+    compacted once stale entries outnumber live ones.
+
+    - add: O(log n), evicting at most one item
+    - top_k: O(k log n)
+    - remove: O(1) plus amortized compaction
+    """
+
+    def __init__(self, max_entries: int = 1000, initial_capacity: int = 16):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        capacity = max(1, min(initial_capacity, max_entries + 1))
+        self._importance = np.zeros(capacity, dtype=np.float32)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._payloads: List[Optional[T]] = [None] * capacity
+        self._free_slots: List[int] = list(range(capacity - 1, -1, -1))
+        self._slots: Dict[int, int] = {}
+        self._min_heap: List[int] = []
+        self._max_heap: List[int] = []
+        self._next_id = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @max_entries.setter
+    def max_entries(self, value: int) -> None:
+        self.resize(value)
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    @next_id.setter
+    def next_id(self, value: int) -> None:
+        self._next_id = max(self._next_id, value)
+
+    def resize(self, max_entries: int) -> List[Tuple[int, Optional[T]]]:
+        """Change the capacity; return the (id, payload) pairs evicted to fit"""
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        return self._evict_overflow()
+
+    def _grow(self) -> None:
+        old = len(self._payloads)
+        capacity = old * 2
+        self._importance = np.resize(self._importance, capacity)
+        self._timestamps = np.resize(self._timestamps, capacity)
+        self._payloads.extend([None] * (capacity - old))
+        self._free_slots.extend(range(capacity - 1, old - 1, -1))
+
+    def _allocate(self, item_id: int, importance: float, timestamp: float, payload: Optional[T]) -> None:
+        if not self._free_slots:
+            self._grow()
+        slot = self._free_slots.pop()
+        self._importance[slot] = importance
+        self._timestamps[slot] = timestamp
+        self._payloads[slot] = payload
+        self._slots[item_id] = slot
+
+    def _release(self, item_id: int) -> Optional[T]:
+        slot = self._slots.pop(item_id)
+        payload = self._payloads[slot]
+        self._payloads[slot] = None
+        self._free_slots.append(slot)
+        return payload
+
+    def add(self, payload: Optional[T], importance: float, timestamp: float) -> Tuple[int, List[Tuple[int, Optional[T]]]]:
+        """Insert an item; return its id and the (id, payload) pairs evicted to make room"""
+        item_id = self._next_id
+        self._next_id += 1
+        self._allocate(item_id, importance, timestamp, payload)
+        key = _heap_key(importance, timestamp, item_id)
+        heapq.heappush(self._min_heap, key)
+        heapq.heappush(self._max_heap, -key)
+        return item_id, self._evict_overflow()
+
+    def _evict_overflow(self) -> List[Tuple[int, Optional[T]]]:
+        evicted: List[Tuple[int, Optional[T]]] = []
+        while len(self._slots) > self._max_entries:
+            item_id = heapq.heappop(self._min_heap) & _ID_MASK
+            if item_id in self._slots:
+                evicted.append((item_id, self._release(item_id)))
+        if evicted:
+            # Evicted keys stay in the max-heap until compaction drops them
+            self._maybe_compact()
+        return evicted
+
+    def bulk_load(self,
+                  ids: Sequence[int],
+                  importance: Sequence[float],
+                  timestamps: Sequence[float],
+                  payloads: Optional[Sequence[Optional[T]]] = None) -> List[Tuple[int, Optional[T]]]:
+        """Replace the contents with whole columns.
+
+        Heaps are built with heapify (O(n)); ids continue after the largest
+        loaded id. Returns the (id, payload) pairs evicted if the columns
+        exceed capacity.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        n = len(ids)
+        capacity = max(1, n)
+        self._importance = np.zeros(capacity, dtype=np.float32)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._importance[:n] = importance
+        self._timestamps[:n] = timestamps
+        self._payloads = list(payloads) if payloads is not None else []
+        self._payloads.extend([None] * (capacity - len(self._payloads)))
+        self._free_slots = [] if n else [0]
+        id_list = ids.tolist()
+        self._slots = dict(zip(id_list, range(n)))
+        self._min_heap = [
+            _heap_key(imp, ts, item_id)
+            for item_id, imp, ts in zip(id_list, self._importance[:n].tolist(), self._timestamps[:n].tolist())
+        ]
+        self._max_heap = [-key for key in self._min_heap]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+        self._next_id = max(self._next_id, max(id_list, default=-1) + 1)
+        return self._evict_overflow()
+
+    def insert(self, item_id: int, payload: Optional[T], importance: float, timestamp: float) -> List[Tuple[int, Optional[T]]]:
+        """Insert an item under a caller-chosen id (e.g. when restoring); return evicted pairs"""
+        if item_id in self._slots:
+            raise ValueError(f"Item {item_id} is already stored")
+        self._allocate(item_id, importance, timestamp, payload)
+        key = _heap_key(importance, timestamp, item_id)
+        heapq.heappush(self._min_heap, key)
+        heapq.heappush(self._max_heap, -key)
+        self._next_id = max(self._next_id, item_id + 1)
+        return self._evict_overflow()
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Optional[T]]]:
+        """(ids, importance, timestamps, payloads) of every item, in insertion order"""
+        n = len(self._slots)
+        ids = np.fromiter(self._slots.keys(), dtype=np.int64, count=n)
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=n)
+        payloads = [self._payloads[slot] for slot in slots.tolist()]
+        return ids, self._importance[slots], self._timestamps[slots], payloads
+
+    def replace(self, item_id: int, payload: T) -> None:
+        """Swap the payload of a stored item, keeping its ranking"""
+        self._payloads[self._slots[item_id]] = payload
+
+    def remove(self, item_id: int) -> Optional[T]:
+        """Remove an item by id, returning its payload if it was present"""
+        if item_id not in self._slots:
+            return None
+        payload = self._release(item_id)
+        self._maybe_compact()
+        return payload
+
+    def _maybe_compact(self) -> None:
+        live = len(self._slots)
+        if len(self._min_heap) > 2 * live + 64:
+            self._min_heap = [key for key in self._min_heap if key & _ID_MASK in self._slots]
+            heapq.heapify(self._min_heap)
+        if len(self._max_heap) > 2 * live + 64:
+            self._max_heap = [key for key in self._max_heap if -key & _ID_MASK in self._slots]
+            heapq.heapify(self._max_heap)
+
+    def top_k(self, k: int) -> List[Tuple[int, Optional[T]]]:
+        """Return up to k (id, payload) pairs ordered by importance, then recency"""
+        taken: List[int] = []
+        while self._max_heap and len(taken) < k:
+            key = heapq.heappop(self._max_heap)
+            if -key & _ID_MASK in self._slots:
+                taken.append(key)
+        for key in taken:
+            heapq.heappush(self._max_heap, key)
+        return [(-key & _ID_MASK, self.get(-key & _ID_MASK)) for key in taken]
+
+    def get(self, item_id: int) -> Optional[T]:
+        slot = self._slots.get(item_id)
+        return self._payloads[slot] if slot is not None else None
+
+    def importance(self, item_id: int) -> float:
+        return float(self._importance[self._slots[item_id]])
+
+    def timestamp(self, item_id: int) -> float:
+        return float(self._timestamps[self._slots[item_id]])
+
+    def items(self) -> Iterator[Tuple[int, Optional[T]]]:
+        """(id, payload) pairs in insertion order"""
+        for item_id, slot in self._slots.items():
+            yield item_id, self._payloads[slot]
+
+    def values(self) -> List[Optional[T]]:
+        return [payload for _, payload in self.items()]
+
+    def clear(self) -> None:
+        capacity = len(self._payloads)
+        self._payloads = [None] * capacity
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._slots.clear()
+        self._min_heap.clear()
+        self._max_heap.clear()
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+class MetadataPool:
+    """Deduplicates metadata dicts: identical dicts share one stored copy.
+
+    Entries are reference counted so dicts that are no longer used by any
+    memory are dropped.
+    """
+
+    def __init__(self):
+        self._dicts: List[Optional[Dict[str, Any]]] = []
+        self._refcounts: List[int] = []
+        self._index: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+
+    def intern(self, metadata: Dict[str, Any]) -> int:
+        """Reference for the metadata, reusing an identical stored dict"""
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        ref = self._index.get(key)
+        if ref is None:
+            stored = {sys.intern(k) if isinstance(k, str) else k: v for k, v in metadata.items()}
+            if self._free:
+                ref = self._free.pop()
+                self._dicts[ref] = stored
+                self._refcounts[ref] = 0
+                self._keys[ref] = key
+            else:
+                ref = len(self._dicts)
+                self._dicts.append(stored)
+                self._refcounts.append(0)
+                self._keys.append(key)
+            self._index[key] = ref
+        self._refcounts[ref] += 1
+        return ref
+
+    def retain(self, ref: int, count: int = 1) -> None:
+        """Add references to an interned dict without re-hashing it"""
+        self._refcounts[ref] += count
+
+    def get(self, ref: int) -> Dict[str, Any]:
+        """A copy of the stored dict, safe for callers to mutate"""
+        return dict(self._dicts[ref])
+
+    def release(self, ref: int) -> None:
+        self._refcounts[ref] -= 1
+        if self._refcounts[ref] == 0:
+            del self._index[self._keys[ref]]
+            self._dicts[ref] = None
+            self._keys[ref] = None
+            self._free.append(ref)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def __len__(self) -> int:
+        return len(self._index)
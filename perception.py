@@ -1,11 +1,42 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
-import google.generativeai as genai
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Union
 from dotenv import load_dotenv
+import asyncio
+import functools
+import threading
+import weakref
+from cache import ResponseCache, SingleFlight, make_cache_key
+from context_builder import ContextBuilder
+from resilience import AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError, RateLimitedError, Resilience, RetryPolicy
+from telemetry import metrics, span
 import os
 
 load_dotenv()
 
+# Process-wide defaults, overridable per PerceptionLayer
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("PERCEPTION_MAX_CONCURRENCY", "32"))
+DEFAULT_TIMEOUT = float(os.getenv("PERCEPTION_TIMEOUT", "30"))
+
+# Response cache; PERCEPTION_CACHE_SIZE=0 disables it
+DEFAULT_CACHE_SIZE = int(os.getenv("PERCEPTION_CACHE_SIZE", "1024"))
+DEFAULT_CACHE_TTL = float(os.getenv("PERCEPTION_CACHE_TTL", "3600"))
+DEFAULT_CACHE_PATH = os.getenv("PERCEPTION_CACHE_PATH") or None
+DEFAULT_CACHE_DISK_SIZE = int(os.getenv("PERCEPTION_CACHE_DISK_SIZE", "10000"))
+
+# Quota handling shared by every session. With no PERCEPTION_RATE_LIMIT the
+# limiter stays off until the first 429 and then adapts from observed traffic.
+DEFAULT_RATE_LIMIT = float(os.getenv("PERCEPTION_RATE_LIMIT", "0")) or None
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("PERCEPTION_MAX_ATTEMPTS", "3"))
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("PERCEPTION_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET = float(os.getenv("PERCEPTION_BREAKER_RESET", "30"))
+
+GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
 class UserPreferences(BaseModel):
     """Model for storing user preferences and context"""
     likes: List[str] = Field(default_factory=list, description="User's interests and likes")
@@ -19,51 +50,310 @@ class PerceptionResponse(BaseModel):
     context: Dict[str, Any]
     confidence_score: float = Field(ge=0.0, le=1.0)
 
+class ConcurrencyLimiter:
+    """Caps the number of in-flight model calls.
+
+    asyncio semaphores are bound to the loop they are first used on, so one
+    semaphore is kept per running loop; within a loop the cap is shared by
+    every session using this limiter.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def acquire(self) -> None:
+        await self._semaphore().acquire()
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore().release()
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+# Shared by every PerceptionLayer that does not ask for its own cap
+default_limiter = ConcurrencyLimiter()
+
+# Shared by every PerceptionLayer that does not bring its own cache
+default_cache = ResponseCache(
+    max_entries=DEFAULT_CACHE_SIZE,
+    ttl=DEFAULT_CACHE_TTL,
+    disk_path=DEFAULT_CACHE_PATH,
+    disk_max_entries=DEFAULT_CACHE_DISK_SIZE
+) if DEFAULT_CACHE_SIZE > 0 else None
+
+# Identical concurrent requests from any session share one model call
+default_single_flight = SingleFlight()
+
+# One rate limiter, retry policy and circuit breaker for the Gemini backend
+default_resilience = Resilience(
+    limiter=AdaptiveRateLimiter(rate=DEFAULT_RATE_LIMIT),
+    breaker=CircuitBreaker(DEFAULT_BREAKER_THRESHOLD, DEFAULT_BREAKER_RESET),
+    retry=RetryPolicy(max_attempts=DEFAULT_MAX_ATTEMPTS)
+)
+
+_USE_DEFAULT_CACHE = object()
+
+_shared_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+def get_shared_model(model_name: str = "gemini-2.0-flash") -> Any:
+    """Process-wide GenerativeModel, so every session shares one configured client.
+
+    google.generativeai is imported here, on first use, rather than at module
+    import: it dominates import time and isn't needed with an injected model.
+    """
+    model = _shared_models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _shared_models.get(model_name)
+            if model is None:
+                import google.generativeai as genai
+                if not _shared_models:
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                model = genai.GenerativeModel(model_name)
+                _shared_models[model_name] = model
+    return model
+
 class PerceptionLayer:
-    def __init__(self):
-        # Configure Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+    def __init__(self,
+                 max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 cache: Optional[ResponseCache] = _USE_DEFAULT_CACHE,
+                 model: Optional[Any] = None,
+                 resilience: Optional[Resilience] = None,
+                 context_builder: Optional[ContextBuilder] = None):
+        # Gemini client shared across layers unless one is injected; the shared
+        # client is only built when the first request needs it
+        self._model = model
+        self.model_name = getattr(model, "model_name", "gemini-2.0-flash")
         self.user_preferences = None
+        self.limiter = default_limiter if max_concurrency is None else ConcurrencyLimiter(max_concurrency)
+        self.timeout = timeout
+        # Pass cache=None to always call the model
+        self.cache = default_cache if cache is _USE_DEFAULT_CACHE else cache
+        self.single_flight = default_single_flight
+        self.resilience = resilience or default_resilience
+        # Per-session prompt assembly: token budget, recent turns, rolling summary
+        self.context = context_builder or ContextBuilder()
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            self._model = get_shared_model(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, model: Any) -> None:
+        self._model = model
+        self.model_name = getattr(model, "model_name", self.model_name)
 
     def set_user_preferences(self, preferences: UserPreferences):
         """Set user preferences for context-aware processing"""
         self.user_preferences = preferences
 
-    async def process_input(self, input_text: str) -> PerceptionResponse:
-        """Process input text with context from user preferences"""
+    def _build_prompt(self, input_text: str, memories: Optional[List[str]] = None) -> str:
+        """Create context-aware prompt within the context token budget"""
+        return self.context.build(input_text, self.user_preferences, memories or ())
+
+    def _cache_key(self, prompt: str) -> str:
+        """Key on the normalized prompt, preferences and generation settings"""
+        return make_cache_key(
+            prompt,
+            self.user_preferences.model_dump(),
+            GENERATION_CONFIG,
+            self.model_name
+        )
+
+    def _cache_lookup(self, key: str) -> Optional[PerceptionResponse]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            metrics.inc("perception_cache_misses_total")
+            return None
+        metrics.inc("perception_cache_hits_total")
+        return PerceptionResponse(**cached)
+
+    def _cache_store(self, key: str, response: PerceptionResponse) -> None:
+        if self.cache is not None:
+            self.cache.set(key, response.model_dump())
+
+    @staticmethod
+    def _record_usage(response: Any) -> None:
+        """Count tokens when the response reports usage"""
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "total_token_count", None) if usage is not None else None
+        if tokens:
+            metrics.inc("perception_tokens_total", tokens)
+
+    def _build_response(self, processed_text: str) -> PerceptionResponse:
+        """Wrap generated text in a PerceptionResponse"""
+        confidence = 0.9  # This could be calculated based on response properties
+        return PerceptionResponse(
+            processed_input=processed_text,
+            context={"user_preferences": self.user_preferences.model_dump()},
+            confidence_score=confidence
+        )
+
+    async def _generate(self, prompt: str, stream: bool = False) -> Any:
+        """Call the model without blocking the event loop"""
+        # The SDK accepts a plain mapping, so genai.types isn't needed here
+        generation_config = dict(GENERATION_CONFIG)
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            if stream:
+                return await generate_async(prompt, generation_config=generation_config, stream=True)
+            return await generate_async(prompt, generation_config=generation_config)
+
+        # Fall back to the blocking client on the default executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(self.model.generate_content, prompt, generation_config=generation_config)
+        )
+
+    async def process_input(self, input_text: str, memories: Optional[List[str]] = None) -> PerceptionResponse:
+        """Process input text with context from user preferences, memories and earlier turns"""
         if not self.user_preferences:
             raise ValueError("User preferences not set. Call set_user_preferences first.")
 
-        # Create context-aware prompt
-        context_prompt = f"""
-        User Context:
-        - Location: {self.user_preferences.location}
-        - Interests: {', '.join(self.user_preferences.likes)}
-        - Favorite Topics: {', '.join(self.user_preferences.favorite_topics)}
-        
-        Input to process: {input_text}
-        """
+        context_prompt = self._build_prompt(input_text, memories)
+        cache_key = self._cache_key(context_prompt)
+        result = self._cache_lookup(cache_key)
+        if result is None:
+            result = await self.single_flight.do(cache_key, lambda: self._fetch(cache_key, context_prompt))
+        self.context.record_turn(input_text, result.processed_input)
+        return result
+
+    async def _fetch(self, cache_key: str, context_prompt: str) -> PerceptionResponse:
+        """Call the model and cache the result"""
+        async def attempt() -> Any:
+            # Backoff between attempts happens outside the concurrency slot
+            async with self.limiter:
+                with span("perception.network"):
+                    return await asyncio.wait_for(self._generate(context_prompt), self.timeout)
 
         try:
             # Generate response using Gemini Flash
-            response = self.model.generate_content(
-                context_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.8,
-                    top_k=40,
-                    max_output_tokens=2048,
-                )
-            )
-
-            processed_text = response.text
-            confidence = 0.9  # This could be calculated based on response properties
-
-            return PerceptionResponse(
-                processed_input=processed_text,
-                context={"user_preferences": self.user_preferences.model_dump()},
-                confidence_score=confidence
-            )
+            response = await self.resilience.call(attempt)
+
+            with span("perception.parse"):
+                result = self._build_response(response.text)
+            self._record_usage(response)
+            self._cache_store(cache_key, result)
+            return result
+        except (CircuitOpenError, RateLimitedError):
+            # Typed so callers can fail fast (503 / 429) rather than report a generic error
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Error in perception layer: model call timed out after {self.timeout}s")
         except Exception as e:
-            raise Exception(f"Error in perception layer: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error in perception layer: {str(e)}")
+
+    async def process_input_stream(self,
+                                   input_text: str,
+                                   memories: Optional[List[str]] = None) -> AsyncIterator[Union[str, PerceptionResponse]]:
+        """Stream generated text chunks, then yield the complete PerceptionResponse"""
+        if not self.user_preferences:
+            raise ValueError("User preferences not set. Call set_user_preferences first.")
+
+        context_prompt = self._build_prompt(input_text, memories)
+        cache_key = self._cache_key(context_prompt)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            self.context.record_turn(input_text, cached.processed_input)
+            yield cached.processed_input
+            yield cached
+            return
+
+        # Identical concurrent requests share one model stream; each caller gets every chunk
+        stream = self.single_flight.stream(
+            cache_key, lambda publish: self._fetch_stream(cache_key, context_prompt, publish)
+        )
+        streamed = False
+        try:
+            async for item in stream:
+                if isinstance(item, PerceptionResponse):
+                    if not streamed:
+                        # Joined a non-streaming call, so the text arrives in one piece
+                        yield item.processed_input
+                    self.context.record_turn(input_text, item.processed_input)
+                    yield item
+                else:
+                    streamed = True
+                    yield item
+        finally:
+            # Leave the shared call now, not when the generator is collected
+            await stream.aclose()
+
+    async def _fetch_stream(self,
+                            cache_key: str,
+                            context_prompt: str,
+                            publish: Callable[[str], None]) -> PerceptionResponse:
+        """Stream the model's text through publish, then cache and return the full result.
+
+        The timeout applies to the initial call and to each subsequent chunk.
+        Clients without async streaming publish the whole text as one chunk.
+        """
+        chunks: List[str] = []
+
+        async def open_stream() -> Any:
+            # As in _fetch, each attempt takes its own slot so backoff happens
+            # outside it; the successful attempt keeps it while chunks are read
+            await self.limiter.acquire()
+            try:
+                return await asyncio.wait_for(self._generate(context_prompt, stream=True), self.timeout)
+            except BaseException:
+                self.limiter.release()
+                raise
+
+        try:
+            # Only opening the stream is retried; chunks already published can't be taken back
+            response = await self.resilience.call(open_stream)
+            try:
+                if hasattr(response, "__aiter__"):
+                    iterator = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        text = chunk.text
+                        if text:
+                            chunks.append(text)
+                            publish(text)
+                else:
+                    chunks.append(response.text)
+                    publish(response.text)
+            finally:
+                self.limiter.release()
+        except (CircuitOpenError, RateLimitedError):
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Error in perception layer: model call timed out after {self.timeout}s")
+        except Exception as e:
+            raise Exception(f"Error in perception layer: {str(e)}")
+
+        result = self._build_response("".join(chunks))
+        self._cache_store(cache_key, result)
+        return result
\ No newline at end of file
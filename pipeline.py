@@ -0,0 +1,97 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Set, Tuple, Union
+import asyncio
+import inspect
+import time
+import telemetry
+
+StageFn = Callable[[Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+class Stage:
+    """A named pipeline step that runs once all of its dependencies are done.
+
+    The function receives a dict of dependency results keyed by stage name.
+    Stages marked ``critical=False`` run in the background: the pipeline does
+    not wait for them before returning.
+    """
+
+    def __init__(self, name: str, fn: StageFn, deps: Iterable[str] = (), critical: bool = True):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.critical = critical
+
+class StageGraph:
+    """Runs a small DAG of async stages, overlapping independent ones"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in pipeline at stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, float], List["asyncio.Task"]]:
+        """Run every stage; return critical results, per-stage timings and background tasks.
+
+        Timings are seconds spent inside each stage's own function; each
+        stage is also recorded as a telemetry span. If a critical stage
+        fails, the remaining stages are cancelled and the error is raised.
+        """
+        loop = asyncio.get_running_loop()
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            inputs = {}
+            for dep in stage.deps:
+                inputs[dep] = await tasks[dep]
+            start = time.perf_counter()
+            try:
+                result = stage.fn(inputs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                timings[stage.name] = time.perf_counter() - start
+                telemetry.record_span(stage.name, start, timings[stage.name])
+
+        # Create every task before any runs so dependencies can be awaited
+        for name, stage in self.stages.items():
+            tasks[name] = loop.create_task(run_stage(stage), name=name)
+
+        critical = {name: task for name, task in tasks.items() if self.stages[name].critical}
+        background = [task for name, task in tasks.items() if not self.stages[name].critical]
+        for task in background:
+            task.add_done_callback(consume_exception)
+
+        try:
+            results = await asyncio.gather(*critical.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(critical, results)), timings, background
+
+def consume_exception(task: "asyncio.Task") -> None:
+    """Done callback for tasks nobody awaits: count their failures by task name"""
+    if not task.cancelled() and task.exception() is not None:
+        telemetry.metrics.inc("background_task_errors_total", labels={"task": task.get_name()})
@@ -0,0 +1,256 @@
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+from collections import deque
+import asyncio
+import random
+import threading
+import time
+from telemetry import metrics
+
+T = TypeVar("T")
+
+# HTTP-style status codes that google.api_core errors carry in ``code``
+RATE_LIMIT_CODES = frozenset({429})
+TRANSIENT_CODES = frozenset({429, 500, 502, 503, 504})
+_TRANSIENT_NAMES = frozenset({
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+})
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    # grpc-style codes expose the HTTP mapping as a second value
+    value = getattr(code, "value", None)
+    if isinstance(value, tuple) and value and isinstance(value[0], int):
+        return {8: 429, 13: 500, 14: 503, 4: 504}.get(value[0])
+    return None
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True for quota / 429 errors"""
+    return (
+        _status_code(exc) in RATE_LIMIT_CODES
+        or type(exc).__name__ in ("ResourceExhausted", "TooManyRequests")
+    )
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors worth retrying: throttling, 5xx and timeouts"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return _status_code(exc) in TRANSIENT_CODES or type(exc).__name__ in _TRANSIENT_NAMES
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that is failing"""
+
+class RateLimitedError(Exception):
+    """Raised when the backend is still throttling after the last retry"""
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate backs off on 429s and creeps back up on success.
+
+    Rates are in requests per second. With ``rate=None`` calls are not
+    limited until the first 429; the bucket then starts from the request
+    rate observed just before it. A throttle multiplies the rate by
+    ``decrease`` (at most once per ``cooldown``, since one overload produces
+    a burst of 429s) and each success adds ``increase`` (AIMD), so sustained
+    throughput settles just under the quota. State is guarded by a thread
+    lock and waiting is a plain ``asyncio.sleep``, so one limiter can be
+    shared by every session and event loop in the process.
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 min_rate: float = 0.5,
+                 max_rate: Optional[float] = None,
+                 increase: float = 0.05,
+                 decrease: float = 0.5,
+                 cooldown: float = 1.0,
+                 window: float = 5.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.window = window
+        self._last_decrease = float("-inf")
+        self._tokens = self._capacity()
+        self._updated = time.monotonic()
+        self._recent: Deque[float] = deque(maxlen=4096)
+        self._lock = threading.Lock()
+
+    def _capacity(self) -> float:
+        if self.rate is None:
+            return 0.0
+        return self.burst if self.burst is not None else max(1.0, self.rate)
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait for a token; tokens are reserved up front so waiters stay in order"""
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            if self.rate is None:
+                return
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observed_rate(self) -> float:
+        """Requests per second over the last ``window`` seconds"""
+        with self._lock:
+            now = time.monotonic()
+            recent = [t for t in self._recent if t >= now - self.window]
+            if not recent:
+                return 0.0
+            return len(recent) / max(now - recent[0], 1.0)
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease after a 429"""
+        metrics.inc("perception_throttled_total")
+        observed = self.observed_rate()
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            current = self.rate if self.rate is not None else observed
+            self._refill(now)
+            self.rate = max(self.min_rate, current * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        metrics.set_gauge("perception_rate_limit", rate)
+
+    def on_success(self) -> None:
+        """Additive increase after a successful call"""
+        with self._lock:
+            if self.rate is None:
+                return
+            self._refill(time.monotonic())
+            self.rate += self.increase
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+            rate = self.rate
+        metrics.set_gauge("perception_rate_limit", rate)
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single probe is
+    let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call should not be attempted"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_timeout - now
+            # A probe that never reported back (e.g. cancelled) is replaced
+            if remaining <= 0 and (self.state == self.OPEN or self._probing):
+                self.state = self.HALF_OPEN
+                self._probing = True
+                self._opened_at = now
+                return
+        metrics.inc("perception_circuit_rejections_total")
+        raise CircuitOpenError(
+            f"backend unavailable, failing fast for {max(0.0, remaining):.1f}s"
+        )
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.inc("perception_circuit_opened_total")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number ``attempt`` (1-based)"""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class Resilience:
+    """Rate limiting, retries and circuit breaking around one backend"""
+
+    def __init__(self,
+                 limiter: Optional[AdaptiveRateLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 retry: Optional[RetryPolicy] = None):
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.retry = retry or RetryPolicy()
+
+    async def call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await ``factory()``, retrying transient errors with backoff.
+
+        Non-transient errors are raised at once and do not count against the
+        circuit. CircuitOpenError is raised without calling the backend, and
+        RateLimitedError once the last attempt is throttled.
+        """
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            await self.limiter.acquire()
+            try:
+                result = await factory()
+            except Exception as e:
+                if not is_transient(e):
+                    # The backend answered, so it is healthy
+                    self.breaker.on_success()
+                    raise
+                if is_rate_limited(e):
+                    self.limiter.on_throttle()
+                else:
+                    self.breaker.on_failure()
+                if attempt >= self.retry.max_attempts:
+                    if is_rate_limited(e):
+                        raise RateLimitedError(str(e)) from e
+                    raise
+                metrics.inc("perception_retries_total")
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            self.breaker.on_success()
+            self.limiter.on_success()
+            return result
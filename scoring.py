@@ -0,0 +1,138 @@
+from typing import Any, Dict, List, Mapping, Optional, Protocol, Sequence
+import json
+import numpy as np
+
+# Context features, in column order of the feature matrix
+FEATURES: List[str] = [
+    "bias",
+    "has_user_preferences",
+    "no_constraints",
+    "is_flash_model",
+    "perception_confidence",
+    "memory_confidence",
+]
+_FEATURE_INDEX = {name: index for index, name in enumerate(FEATURES)}
+
+def _nested_float(context: Mapping[str, Any], section: str, key: str) -> float:
+    value = context.get(section)
+    if isinstance(value, Mapping):
+        try:
+            return float(value.get(key, 0.0))
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+def featurize(contexts: Sequence[Mapping[str, Any]],
+              constraints: Optional[Sequence[Optional[Mapping[str, Any]]]] = None) -> np.ndarray:
+    """Feature matrix of shape (len(contexts), len(FEATURES))"""
+    features = np.zeros((len(contexts), len(FEATURES)), dtype=np.float64)
+    features[:, 0] = 1.0
+    for row, context in enumerate(contexts):
+        row_constraints = constraints[row] if constraints is not None else None
+        features[row, 1] = "user_preferences" in context
+        features[row, 2] = not row_constraints
+        features[row, 3] = context.get("model") == "gemini-2.0-flash"
+        features[row, 4] = _nested_float(context, "perception", "confidence_score")
+        features[row, 5] = _nested_float(context, "memory", "confidence_score")
+    return features
+
+class ScoringPolicy(Protocol):
+    """Maps a feature matrix (contexts x FEATURES) to scores (contexts x actions)"""
+
+    def score(self, features: np.ndarray, actions: Sequence[str]) -> np.ndarray:
+        ...
+
+class LinearPolicy:
+    """Per-action linear weights over the context features"""
+
+    def __init__(self, weights: Mapping[str, Mapping[str, float]], default: Optional[Mapping[str, float]] = None):
+        # weights: action value -> feature name -> weight; default applies to
+        # actions without their own entry
+        self.weights = {action: dict(row) for action, row in weights.items()}
+        self.default = dict(default or {})
+        self._matrices: Dict[tuple, np.ndarray] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "LinearPolicy":
+        """Load {"default": {...}, "weights": {action: {feature: weight}}} from JSON"""
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data.get("weights", {}), data.get("default"))
+
+    def _matrix(self, actions: Sequence[str]) -> np.ndarray:
+        key = tuple(actions)
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            matrix = np.zeros((len(FEATURES), len(actions)), dtype=np.float64)
+            for column, action in enumerate(actions):
+                for feature, weight in self.weights.get(action, self.default).items():
+                    if feature not in _FEATURE_INDEX:
+                        raise ValueError(f"Unknown feature: {feature}")
+                    matrix[_FEATURE_INDEX[feature], column] = weight
+            self._matrices[key] = matrix
+        return matrix
+
+    def score(self, features: np.ndarray, actions: Sequence[str]) -> np.ndarray:
+        return features @ self._matrix(actions)
+
+class RulesPolicy:
+    """Additive rules: when a feature reaches a threshold, add to an action's score.
+
+    Each rule is {"feature": name, "min": threshold, "action": value or "*", "add": delta}.
+    """
+
+    def __init__(self, rules: Sequence[Mapping[str, Any]]):
+        for rule in rules:
+            if rule["feature"] not in _FEATURE_INDEX:
+                raise ValueError(f"Unknown feature: {rule['feature']}")
+        self.rules = [dict(rule) for rule in rules]
+
+    @classmethod
+    def from_file(cls, path: str) -> "RulesPolicy":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def score(self, features: np.ndarray, actions: Sequence[str]) -> np.ndarray:
+        scores = np.zeros((features.shape[0], len(actions)), dtype=np.float64)
+        for rule in self.rules:
+            fired = features[:, _FEATURE_INDEX[rule["feature"]]] >= rule.get("min", 1.0)
+            target = np.array([rule.get("action", "*") in ("*", action) for action in actions])
+            scores += rule["add"] * np.outer(fired, target)
+        return scores
+
+# The original hand-written confidence rules, shared by every action
+_BASE_WEIGHTS = {
+    "bias": 0.5,
+    "has_user_preferences": 0.2,
+    "no_constraints": 0.1,
+    "is_flash_model": 0.1,
+}
+
+def _weights(**overrides: float) -> Dict[str, float]:
+    return dict(_BASE_WEIGHTS, **overrides)
+
+# Per-action weights so actions are ranked, not tied: answering directly is
+# favoured when perception is confident, searching when memory has little,
+# and actions with side effects need more evidence (destructive ones most)
+DEFAULT_POLICY = LinearPolicy({
+    "respond": _weights(bias=0.4, perception_confidence=0.2),
+    "search": _weights(bias=0.45, memory_confidence=-0.3),
+    "calculate": _weights(bias=0.35),
+    "create": _weights(bias=0.3),
+    "modify": _weights(bias=0.25),
+    "delete": _weights(bias=0.1),
+}, default=_BASE_WEIGHTS)
+
+class ScoringEngine:
+    """Scores (contexts x actions) in one vectorized pass"""
+
+    def __init__(self, policy: Optional[ScoringPolicy] = None):
+        self.policy = policy or DEFAULT_POLICY
+
+    def score(self,
+              contexts: Sequence[Mapping[str, Any]],
+              actions: Sequence[str],
+              constraints: Optional[Sequence[Optional[Mapping[str, Any]]]] = None) -> np.ndarray:
+        """Confidence matrix of shape (len(contexts), len(actions)), clipped to [0, 1]"""
+        scores = self.policy.score(featurize(contexts, constraints), actions)
+        return np.clip(scores, 0.0, 1.0)
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from main import AgentResponse, CognitiveAgent
+from perception import UserPreferences
+from resilience import CircuitOpenError, RateLimitedError
+from snapshot import SnapshotError
+from telemetry import metrics
+
+SESSION_IDLE_TTL = float(os.getenv("AGENT_SESSION_IDLE_TTL", "1800"))
+MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "10000"))
+TENANT_CONCURRENCY = int(os.getenv("AGENT_TENANT_CONCURRENCY", "16"))
+TENANT_QUEUE_TIMEOUT = float(os.getenv("AGENT_TENANT_QUEUE_TIMEOUT", "5"))
+MAX_SNAPSHOT_BYTES = int(os.getenv("AGENT_MAX_SNAPSHOT_BYTES", str(64 << 20)))
+
+class SessionCreate(BaseModel):
+    """Request body for creating a session"""
+    preferences: UserPreferences = Field(default_factory=UserPreferences)
+
+class SessionInfo(BaseModel):
+    """Response for a created session"""
+    session_id: str
+    tenant_id: str
+
+class MessageRequest(BaseModel):
+    """Request body for a single turn"""
+    input: str
+
+class Session:
+    """One hosted CognitiveAgent and its bookkeeping"""
+
+    def __init__(self, session_id: str, tenant_id: str, agent: CognitiveAgent):
+        self.session_id = session_id
+        self.tenant_id = tenant_id
+        self.agent = agent
+        self.last_used = time.monotonic()
+        self.active = 0
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+class SessionManager:
+    """Hosts many agent sessions per process.
+
+    Every agent uses the process-wide Gemini client from perception.py.
+    Sessions idle for longer than idle_ttl are evicted by a periodic sweep,
+    which also drops the concurrency slots of tenants left without sessions.
+    Past max_sessions, the least recently used idle session is evicted.
+    """
+
+    def __init__(self,
+                 idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = MAX_SESSIONS,
+                 tenant_concurrency: int = TENANT_CONCURRENCY):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.tenant_concurrency = tenant_concurrency
+        self.sessions: Dict[str, Session] = {}
+        self._tenant_limits: Dict[str, asyncio.Semaphore] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def create(self, tenant_id: str, preferences: UserPreferences) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            self._evict_lru()
+        agent = CognitiveAgent()
+        await agent.set_user_preferences(preferences)
+        session = Session(uuid.uuid4().hex, tenant_id, agent)
+        self.sessions[session.session_id] = session
+        return session
+
+    def adopt(self, session_id: str, tenant_id: str, agent: CognitiveAgent) -> Session:
+        """Host an agent restored from another process under its original id"""
+        if session_id not in self.sessions and len(self.sessions) >= self.max_sessions:
+            self._evict_lru()
+        session = Session(session_id, tenant_id, agent)
+        self.sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str, tenant_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None or session.tenant_id != tenant_id:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session.touch()
+        return session
+
+    def delete(self, session_id: str, tenant_id: str) -> None:
+        self.get(session_id, tenant_id)
+        del self.sessions[session_id]
+
+    def _evict_lru(self) -> None:
+        idle = [session for session in self.sessions.values() if session.active == 0]
+        if not idle:
+            raise HTTPException(status_code=503, detail="Session limit reached")
+        oldest = min(idle, key=lambda session: session.last_used)
+        del self.sessions[oldest.session_id]
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle for longer than idle_ttl; return how many"""
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [
+            session_id for session_id, session in self.sessions.items()
+            if session.active == 0 and session.last_used < cutoff
+        ]
+        for session_id in expired:
+            del self.sessions[session_id]
+        return len(expired)
+
+    def _tenant_limit(self, tenant_id: str) -> asyncio.Semaphore:
+        limit = self._tenant_limits.get(tenant_id)
+        if limit is None:
+            limit = asyncio.Semaphore(self.tenant_concurrency)
+            self._tenant_limits[tenant_id] = limit
+        return limit
+
+    def tenant_saturated(self, tenant_id: str) -> bool:
+        limit = self._tenant_limits.get(tenant_id)
+        return limit is not None and limit.locked()
+
+    def drop_idle_tenants(self) -> int:
+        """Forget the concurrency slots of tenants without sessions; return how many"""
+        hosted = {session.tenant_id for session in self.sessions.values()}
+        idle = [tenant_id for tenant_id in self._tenant_limits if tenant_id not in hosted]
+        for tenant_id in idle:
+            del self._tenant_limits[tenant_id]
+        return len(idle)
+
+    @asynccontextmanager
+    async def turn(self, session: Session) -> AsyncIterator[None]:
+        """Hold a tenant concurrency slot for the duration of one turn"""
+        limit = self._tenant_limit(session.tenant_id)
+        # Counted while queued too, so eviction keeps the session and its tenant's slots
+        session.active += 1
+        try:
+            try:
+                await asyncio.wait_for(limit.acquire(), TENANT_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=429, detail="Too many concurrent requests for tenant")
+            try:
+                yield
+            finally:
+                limit.release()
+        finally:
+            session.active -= 1
+            session.touch()
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_ttl / 10))
+            self.evict_idle()
+            self.drop_idle_tenants()
+
+    def start(self) -> None:
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await asyncio.gather(*(session.agent.drain() for session in self.sessions.values()))
+
+sessions = SessionManager()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    sessions.start()
+    yield
+    await sessions.stop()
+
+app = FastAPI(title="Cognitive Agent Service", lifespan=lifespan)
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    return {"status": "ok", "sessions": len(sessions.sessions)}
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus text exposition of the in-process metrics"""
+    metrics.set_gauge("agent_sessions", len(sessions.sessions))
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/sessions", response_model=SessionInfo)
+async def create_session(body: SessionCreate, x_tenant_id: str = Header(default="default")) -> SessionInfo:
+    session = await sessions.create(x_tenant_id, body.preferences)
+    return SessionInfo(session_id=session.session_id, tenant_id=session.tenant_id)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, x_tenant_id: str = Header(default="default")) -> Dict[str, Any]:
+    sessions.delete(session_id, x_tenant_id)
+    return {"deleted": session_id}
+
+@app.get("/sessions/{session_id}/snapshot")
+async def get_snapshot(session_id: str,
+                       full: bool = False,
+                       x_tenant_id: str = Header(default="default")) -> Response:
+    """Binary session snapshot: full the first time, then deltas unless full=true"""
+    session = sessions.get(session_id, x_tenant_id)
+    await session.agent.drain()
+    return Response(session.agent.snapshot(full), media_type="application/octet-stream")
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, or 413 once it passes limit bytes"""
+    too_large = HTTPException(status_code=413, detail=f"Body exceeds {limit} bytes")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+@app.put("/sessions/{session_id}/snapshot", response_model=SessionInfo)
+async def put_snapshot(session_id: str,
+                       request: Request,
+                       x_tenant_id: str = Header(default="default")) -> SessionInfo:
+    """Restore a migrated session, or apply deltas to one already restored here"""
+    data = await _read_body(request, MAX_SNAPSHOT_BYTES)
+    existing = sessions.sessions.get(session_id)
+    try:
+        if existing is not None and existing.tenant_id == x_tenant_id:
+            existing.agent.apply_snapshot(data)
+            existing.touch()
+            session = existing
+        elif existing is not None:
+            raise HTTPException(status_code=409, detail="Session id is in use")
+        else:
+            session = sessions.adopt(session_id, x_tenant_id, CognitiveAgent.restore(data))
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SessionInfo(session_id=session.session_id, tenant_id=session.tenant_id)
+
+@app.post("/sessions/{session_id}/messages", response_model=AgentResponse)
+async def send_message(session_id: str,
+                       body: MessageRequest,
+                       x_tenant_id: str = Header(default="default")) -> AgentResponse:
+    session = sessions.get(session_id, x_tenant_id)
+    async with sessions.turn(session):
+        try:
+            return await session.agent.process(body.input)
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except RateLimitedError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+@app.post("/sessions/{session_id}/stream")
+async def stream_message(session_id: str,
+                         body: MessageRequest,
+                         x_tenant_id: str = Header(default="default")) -> StreamingResponse:
+    """Server-sent events: "chunk" events with text, then one "response" event"""
+    session = sessions.get(session_id, x_tenant_id)
+    # Fail fast with a plain 429 when the tenant is already at its limit
+    if sessions.tenant_saturated(x_tenant_id):
+        raise HTTPException(status_code=429, detail="Too many concurrent requests for tenant")
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async with sessions.turn(session):
+                async for item in session.agent.process_stream(body.input):
+                    if isinstance(item, AgentResponse):
+                        yield _sse("response", item.model_dump(mode="json"))
+                    else:
+                        yield _sse("chunk", item)
+        except HTTPException as e:
+            yield _sse("error", e.detail)
+        except Exception as e:
+            yield _sse("error", str(e))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+if __name__ == "__main__":
+    # Only needed when run as a script
+    import uvicorn
+    uvicorn.run(
+        app,
+        host=os.getenv("AGENT_HOST", "0.0.0.0"),
+        port=int(os.getenv("AGENT_PORT", "8000"))
+    )
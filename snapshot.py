@@ -0,0 +1,343 @@
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+from collections import Counter
+import json
+import os
+import secrets
+import struct
+import sys
+import zlib
+import numpy as np
+from decision_making import DecisionTrace
+from perception import PerceptionLayer, UserPreferences
+
+if TYPE_CHECKING:
+    from main import CognitiveAgent
+
+SNAPSHOT_VERSION = 1
+MAGIC = b"AGSNAP"
+FULL = 0
+DELTA = 1
+# Largest decompressed payload accepted per frame
+MAX_PAYLOAD_BYTES = int(os.getenv("AGENT_SNAPSHOT_MAX_PAYLOAD", str(256 << 20)))
+
+# magic, version, kind, session id, sequence, base sequence, payload crc32, payload bytes
+_HEADER = struct.Struct("<6sHBQQQII")
+_LENGTH = struct.Struct("<I")
+
+class SnapshotError(ValueError):
+    """Raised for snapshots that are corrupt, unsupported or out of sequence"""
+
+class Frame:
+    """One decoded snapshot header and its compressed payload"""
+    __slots__ = ("kind", "session_id", "sequence", "base_sequence", "payload")
+
+    def __init__(self, kind: int, session_id: int, sequence: int, base_sequence: int, payload: bytes):
+        self.kind = kind
+        self.session_id = session_id
+        self.sequence = sequence
+        self.base_sequence = base_sequence
+        self.payload = payload
+
+def read_frames(data: bytes) -> Iterator[Frame]:
+    """Split concatenated snapshots (a full one followed by deltas) into frames"""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset < _HEADER.size:
+            raise SnapshotError("Truncated snapshot header")
+        magic, version, kind, session_id, sequence, base_sequence, crc, length = _HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise SnapshotError("Not an agent snapshot")
+        if version > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        if kind not in (FULL, DELTA):
+            raise SnapshotError(f"Unknown snapshot kind {kind}")
+        offset += _HEADER.size
+        payload = view[offset:offset + length]
+        offset += length
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise SnapshotError("Snapshot payload is truncated or corrupt")
+        yield Frame(kind, session_id, sequence, base_sequence, _decompress(payload))
+
+def _decompress(payload: bytes) -> bytes:
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, MAX_PAYLOAD_BYTES)
+    except zlib.error as e:
+        raise SnapshotError(f"Snapshot payload is corrupt: {e}") from e
+    if decompressor.unconsumed_tail:
+        raise SnapshotError(f"Snapshot payload exceeds {MAX_PAYLOAD_BYTES} bytes")
+    if not decompressor.eof:
+        raise SnapshotError("Snapshot payload is truncated or corrupt")
+    return data
+
+class _Reader:
+    """Sequential reads of the arrays in a decompressed payload"""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.offset = 0
+
+    def take(self, size: int) -> bytes:
+        chunk = self.payload[self.offset:self.offset + size]
+        if len(chunk) != size:
+            raise SnapshotError("Snapshot payload ends early")
+        self.offset += size
+        return chunk
+
+    def array(self, dtype: Any, count: int) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.take(dtype.itemsize * count), dtype=dtype, count=count)
+
+def _encode_traces(traces: List[DecisionTrace]) -> List[List[Any]]:
+    return [[trace.model, trace.created_at, trace.steps] for trace in traces]
+
+def _decode_trace(model: str, created_at: float, steps: List[str]) -> DecisionTrace:
+    trace = DecisionTrace(model)
+    trace.created_at = created_at
+    trace.steps = list(steps)
+    return trace
+
+def _context_state(perception: PerceptionLayer) -> Dict[str, Any]:
+    context = perception.context
+    summary = context.summary
+    return {
+        "recent": [list(turn) for turn in context.recent],
+        "turns": summary.turns,
+        "digests": [list(digest) for digest in summary._digests],
+        "topics": dict(summary._topics),
+    }
+
+def _restore_context(perception: PerceptionLayer, state: Dict[str, Any]) -> None:
+    context = perception.context
+    context.clear()
+    context.recent.extend(tuple(turn) for turn in state["recent"])
+    summary = context.summary
+    summary.turns = state["turns"]
+    summary._digests.extend((digest, cost) for digest, cost in state["digests"])
+    summary._digest_total = sum(cost for _, cost in state["digests"])
+    summary._topics = Counter(state["topics"])
+
+class AgentSnapshotter:
+    """Writes versioned binary snapshots of one CognitiveAgent.
+
+    The first snapshot is full; later ones are deltas holding only the
+    memories added and the ids removed since the previous snapshot, plus the
+    new decision traces. Preferences and conversation context are small and
+    bounded, so every snapshot carries them whole.
+
+    Layout: a fixed header (see _HEADER) and a zlib payload made of a JSON
+    block for the small state followed by raw little-endian columns: removed
+    ids, ids, importance, timestamps, metadata indexes, content lengths,
+    UTF-8 contents and float32 embeddings.
+    """
+
+    def __init__(self, agent: "CognitiveAgent", session_id: Optional[int] = None, sequence: int = 0):
+        self.agent = agent
+        self.session_id = session_id if session_id is not None else secrets.randbits(63)
+        self.sequence = sequence
+        self._base_ids: Optional[np.ndarray] = None
+        self._last_trace: Optional[DecisionTrace] = None
+
+    def mark(self) -> None:
+        """Treat the agent's current state as already snapshotted"""
+        self._base_ids = self.agent.memory.store.export()[0]
+        traces = self.agent.decision.traces
+        self._last_trace = traces[-1] if traces else None
+
+    def _new_traces(self, full: bool) -> List[DecisionTrace]:
+        traces = list(self.agent.decision.traces)
+        if not full and self._last_trace is not None:
+            for i in range(len(traces) - 1, -1, -1):
+                if traces[i] is self._last_trace:
+                    return traces[i + 1:]
+        return traces
+
+    def snapshot(self, full: bool = False) -> bytes:
+        """Full snapshot, or a delta since the previous one"""
+        full = full or self._base_ids is None
+        memory = self.agent.memory
+        ids, importance, timestamps, _ = memory.store.export()
+        if full:
+            removed = np.zeros(0, dtype=np.int64)
+            new = np.ones(len(ids), dtype=bool)
+        else:
+            removed = np.setdiff1d(self._base_ids, ids, assume_unique=True)
+            new = ~np.isin(ids, self._base_ids, assume_unique=True)
+        new_ids = ids[new]
+        id_list = new_ids.tolist()
+
+        # Metadata dicts are written once each and referenced by index
+        payloads = [memory._payload(memory_id) for memory_id in id_list]
+        local: Dict[int, int] = {}
+        dicts: List[Dict[str, Any]] = []
+        metadata_index = np.empty(len(id_list), dtype=np.uint32)
+        for i, (_, ref) in enumerate(payloads):
+            index = local.get(ref)
+            if index is None:
+                index = local[ref] = len(dicts)
+                dicts.append(memory.metadata_pool.get(ref))
+            metadata_index[i] = index
+        contents = [content.encode("utf-8") for content, _ in payloads]
+        lengths = np.fromiter((len(content) for content in contents), dtype=np.uint32, count=len(contents))
+
+        if memory.vector_index is not None:
+            vectors = memory.vector_index.get(id_list)
+            embedding_dim = memory.vector_index.dim
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+            embedding_dim = 0
+
+        traces = self._new_traces(full)
+        preferences = self.agent.user_preferences
+        meta = json.dumps({
+            "preferences": preferences.model_dump(mode="json") if preferences is not None else None,
+            "context": _context_state(self.agent.perception),
+            "traces": _encode_traces(traces),
+            "metadata": dicts,
+            "removed": len(removed),
+            "count": len(id_list),
+            "next_id": memory.store.next_id,
+            "embedding_dim": embedding_dim,
+        }, separators=(",", ":"), default=str).encode("utf-8")
+
+        payload = b"".join([
+            _LENGTH.pack(len(meta)), meta,
+            removed.astype("<i8").tobytes(),
+            new_ids.astype("<i8").tobytes(),
+            importance[new].astype("<f4").tobytes(),
+            timestamps[new].astype("<f8").tobytes(),
+            metadata_index.astype("<u4").tobytes(),
+            lengths.astype("<u4").tobytes(),
+            b"".join(contents),
+            np.ascontiguousarray(vectors, dtype="<f4").tobytes(),
+        ])
+        compressed = zlib.compress(payload, 1)
+
+        base_sequence = 0 if full else self.sequence
+        self.sequence += 1
+        header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, FULL if full else DELTA, self.session_id,
+                              self.sequence, base_sequence, zlib.crc32(compressed), len(compressed))
+        self._base_ids = ids
+        if traces:
+            self._last_trace = traces[-1]
+        return header + compressed
+
+def _intern_metadata(pool: Any, dicts: List[Dict[str, Any]], metadata_index: np.ndarray) -> List[int]:
+    """Pool refs for each entry; every distinct dict is hashed once"""
+    counts = np.bincount(metadata_index, minlength=len(dicts)).tolist()
+    refs = []
+    for metadata, count in zip(dicts, counts):
+        ref = pool.intern(metadata)
+        if count > 1:
+            pool.retain(ref, count - 1)
+        refs.append(ref)
+    return [refs[i] for i in metadata_index.tolist()]
+
+def _apply(agent: "CognitiveAgent", frame: Frame) -> None:
+    reader = _Reader(frame.payload)
+    (meta_length,) = _LENGTH.unpack(reader.take(_LENGTH.size))
+    meta = json.loads(reader.take(meta_length))
+    removed = reader.array("<i8", meta["removed"])
+    n = meta["count"]
+    ids = reader.array("<i8", n)
+    importance = reader.array("<f4", n)
+    timestamps = reader.array("<f8", n)
+    metadata_index = reader.array("<u4", n)
+    lengths = reader.array("<u4", n)
+    blob = reader.take(int(lengths.sum(dtype=np.int64)))
+    vectors = reader.array("<f4", n * meta["embedding_dim"]).reshape(n, meta["embedding_dim"])
+
+    ends = np.cumsum(lengths, dtype=np.int64).tolist()
+    starts = [0] + ends[:-1]
+    contents = [sys.intern(blob[start:end].decode("utf-8")) for start, end in zip(starts, ends)]
+
+    # Preferences are validated once; memory entries never go through Pydantic
+    if meta["preferences"] is not None or frame.kind == FULL:
+        preferences = None
+        if meta["preferences"] is not None:
+            preferences = UserPreferences.model_validate(meta["preferences"])
+        agent.user_preferences = preferences
+        agent.perception.set_user_preferences(preferences)
+    _restore_context(agent.perception, meta["context"])
+    traces = [_decode_trace(*trace) for trace in meta["traces"]]
+
+    memory = agent.memory
+    if frame.kind == FULL:
+        memory.clear_memories()
+        agent.decision.traces.clear()
+    else:
+        memory.remove_memories(removed.tolist())
+    agent.decision.traces.extend(traces)
+    agent.decision.current_trace = agent.decision.traces[-1] if agent.decision.traces else None
+
+    refs = _intern_metadata(memory.metadata_pool, meta["metadata"], metadata_index)
+    payloads = list(zip(contents, refs))
+    if memory.vector_index is not None and vectors.shape[1] != memory.vector_index.dim:
+        # Written without (or with other) embeddings; embed the contents here
+        vectors = memory.embedder.embed(contents) if contents else vectors
+
+    if frame.kind == FULL:
+        evicted = memory.store.bulk_load(ids, importance, timestamps, payloads)
+        if memory.vector_index is not None:
+            memory.vector_index.bulk_load(ids, vectors, importance, timestamps)
+        # Rebuilt on the first keyword query rather than here
+        memory._lexical_stale = memory.lexical_index is not None and n > 0
+    else:
+        evicted = []
+        for i, (memory_id, payload) in enumerate(zip(ids.tolist(), payloads)):
+            evicted.extend(memory.store.insert(memory_id, payload, float(importance[i]), float(timestamps[i])))
+            if memory_id not in memory.store:
+                continue
+            if memory.vector_index is not None:
+                memory.vector_index.add(memory_id, vectors[i], float(importance[i]), float(timestamps[i]))
+            if memory.lexical_index is not None and not memory._lexical_stale:
+                memory.lexical_index.add(memory_id, payload[0])
+    memory.store.next_id = meta["next_id"]
+    memory._forget(evicted)
+    if memory.backend is not None:
+        for memory_id, (content, ref) in zip(ids.tolist(), payloads):
+            if memory_id in memory.store:
+                row = memory.vector_index.get([memory_id])[0] if memory.vector_index is not None else None
+                memory.backend.append(memory_id, content, memory.metadata_pool.get(ref),
+                                      memory.store.importance(memory_id), memory.store.timestamp(memory_id), row)
+    if memory.consolidator is not None:
+        # Signatures are not snapshotted; consolidation re-indexes from the start
+        memory.consolidator.reset()
+
+def restore_agent(data: bytes,
+                  agent: Optional["CognitiveAgent"] = None,
+                  perception: Optional[PerceptionLayer] = None) -> "CognitiveAgent":
+    """Rebuild an agent from a full snapshot and any deltas that follow it.
+
+    With ``agent``, deltas are applied to that agent instead; they must
+    continue the sequence it was restored or last snapshotted at.
+    """
+    if agent is None:
+        from main import CognitiveAgent
+        agent = CognitiveAgent(perception)
+    position = None
+    if agent._snapshotter is not None:
+        position = (agent._snapshotter.session_id, agent._snapshotter.sequence)
+    applied = 0
+    for frame in read_frames(data):
+        if frame.kind == DELTA:
+            if position is None or position[0] != frame.session_id:
+                raise SnapshotError("Delta snapshot without its base snapshot")
+            if frame.base_sequence != position[1]:
+                raise SnapshotError(f"Delta {frame.sequence} follows {frame.base_sequence}, expected {position[1]}")
+        try:
+            _apply(agent, frame)
+        except SnapshotError:
+            raise
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            # Valid framing around bad content: wrong counts, duplicate ids, bad JSON
+            raise SnapshotError(f"Invalid snapshot content: {e}") from e
+        position = (frame.session_id, frame.sequence)
+        applied += 1
+    if not applied:
+        raise SnapshotError("Empty snapshot")
+    # Later snapshots from this agent continue the same sequence
+    agent._snapshotter = AgentSnapshotter(agent, *position)
+    agent._snapshotter.mark()
+    return agent
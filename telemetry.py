@@ -0,0 +1,179 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+class Span(BaseModel):
+    """Timing of one pipeline step within a turn"""
+    name: str
+    start: float = Field(description="Seconds since the start of the turn")
+    duration: float = Field(ge=0.0)
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+
+class TelemetryHook(Protocol):
+    """Receives every finished turn's spans, e.g. to forward them to a tracer"""
+
+    def on_turn(self, spans: List[Span]) -> None:
+        ...
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms with Prometheus text export"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self.hooks: List[TelemetryHook] = []
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self,
+                name: str,
+                value: float,
+                labels: Optional[Dict[str, str]] = None,
+                buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def counter_value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def add_hook(self, hook: TelemetryHook) -> None:
+        self.hooks.append(hook)
+
+    def record_turn(self, spans: List[Span]) -> None:
+        """Feed a finished turn's spans into the histograms and hooks"""
+        for span in spans:
+            self.observe("agent_span_seconds", span.duration, {"span": span.name})
+        for hook in self.hooks:
+            hook.on_turn(spans)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("agent_span_seconds", "Duration of each pipeline span")
+metrics.describe("agent_turns_total", "Completed agent turns")
+metrics.describe("perception_cache_hits_total", "Perception responses served from cache")
+metrics.describe("perception_cache_misses_total", "Perception requests that called the model")
+metrics.describe("perception_tokens_total", "Tokens reported by the model")
+metrics.describe("perception_retries_total", "Retried model calls")
+metrics.describe("perception_throttled_total", "Model calls rejected with a 429")
+metrics.describe("perception_rate_limit", "Current adaptive request rate limit (requests/s)")
+metrics.describe("perception_circuit_opened_total", "Times the model circuit breaker opened")
+metrics.describe("perception_circuit_rejections_total", "Calls rejected while the circuit was open")
+metrics.describe("action_cache_hits_total", "Idempotent action results served from cache")
+metrics.describe("action_timeouts_total", "Action handlers cancelled for exceeding their timeout")
+metrics.describe("memory_entries", "Memories held by the most recently used memory layer")
+metrics.describe("agent_sessions", "Sessions hosted by this process")
+metrics.describe("background_task_errors_total", "Unawaited tasks (background stages, cancelled actions) that failed")
+
+class SpanCollector:
+    """Collects spans for one turn; offsets are relative to its creation"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def add(self, name: str, start: float, duration: float, **attributes: Any) -> None:
+        self.spans.append(Span(
+            name=name,
+            start=max(0.0, start - self.origin),
+            duration=max(0.0, duration),
+            attributes=attributes
+        ))
+
+_current: ContextVar[Optional[SpanCollector]] = ContextVar("telemetry_spans", default=None)
+
+@contextmanager
+def collect_spans():
+    """Collect spans for the enclosed block and the tasks it spawns"""
+    collector = SpanCollector()
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+
+def record_span(name: str, start: float, duration: float, **attributes: Any) -> None:
+    """Record a span on the active turn, if any; times come from time.perf_counter()"""
+    collector = _current.get()
+    if collector is not None:
+        collector.add(name, start, duration, **attributes)
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a block as a span on the active turn"""
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record_span(name, start, time.perf_counter() - start, **attributes)
@@ -0,0 +1,19 @@
+import json
+
+from batch import drop_torn_line, read_completed
+
+def test_torn_last_line_is_dropped_before_resuming(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"id": "1", "ok": True}) + "\n" + '{"id": "2", "ok": tr', encoding="utf-8")
+    drop_torn_line(str(output))
+    assert output.read_text(encoding="utf-8") == json.dumps({"id": "1", "ok": True}) + "\n"
+    assert read_completed(str(output)) == {"1"}
+
+def test_complete_and_single_torn_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"id": "1", "ok": true}\n', encoding="utf-8")
+    drop_torn_line(str(output))
+    assert output.read_text(encoding="utf-8") == '{"id": "1", "ok": true}\n'
+    output.write_text('{"id": "1"', encoding="utf-8")
+    drop_torn_line(str(output))
+    assert output.read_text(encoding="utf-8") == ""
@@ -0,0 +1,20 @@
+from cache import ResponseCache
+
+def test_disk_reads_do_not_wait_for_the_writer(tmp_path):
+    cache = ResponseCache(disk_path=str(tmp_path / "cache.db"))
+    cache.set("a", {"x": 1})
+    cache.flush()
+    cache._entries.clear()
+    with cache._db_lock:
+        # A write transaction left open by the writer thread
+        cache._db.execute("INSERT INTO responses VALUES ('b', '{}', 0)")
+        assert cache.get("a") == {"x": 1}
+        cache._db.commit()
+    assert cache.disk_hits == 1
+
+def test_in_memory_database_reads_through_the_writer_connection():
+    cache = ResponseCache(disk_path=":memory:")
+    cache.set("a", {"x": 1})
+    cache.flush()
+    cache._entries.clear()
+    assert cache.get("a") == {"x": 1}
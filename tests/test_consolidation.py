@@ -0,0 +1,21 @@
+import time
+
+from memory import MemoryLayer
+
+def _summaries(memory):
+    return [entry for entry in memory.memories if entry.metadata.get("kind") == "summary"]
+
+def test_cold_scan_does_not_stall_behind_important_memories():
+    memory = MemoryLayer(max_memories=10000, semantic=False, lexical=False)
+    old = time.time() - 10 * 86400
+    for i in range(3):
+        memory._insert(f"low early {i}", {}, 0.1, old + i)
+    for i in range(300):
+        memory._insert(f"important {i} zz{i}", {}, 0.9, old + 10 + i)
+    for i in range(50):
+        memory._insert(f"low late {i} qq{i * 7}", {}, 0.1, old + 400 + i)
+
+    for _ in range(10):
+        memory.consolidator.step()
+    assert _summaries(memory)
+    assert memory.consolidator._cold_cursor > 256
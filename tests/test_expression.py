@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+import pytest
+
+from expression import ExpressionError, evaluate, evaluate_batch
+
+def _fast(fn, limit=0.5):
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        assert time.perf_counter() - start < limit
+
+def test_arithmetic():
+    assert evaluate("2 + 3 * 4") == 14
+    assert evaluate("max(1, 5, 3)") == 5
+    assert evaluate("round(3.14159, 2)") == 3.14
+    assert evaluate("x * y", {"x": 2, "y": 4}) == 8
+
+@pytest.mark.parametrize("expression", [
+    "round(1, -10**7)",
+    "round(1.5, 10**7)",
+    "round(10**1000, -10**9)",
+])
+def test_round_digits_are_clamped(expression):
+    _fast(lambda: evaluate(expression))
+
+def test_round_rejects_non_integer_digits():
+    with pytest.raises(ExpressionError):
+        evaluate("round(1.5, 0.5)")
+    with pytest.raises(ExpressionError):
+        evaluate_batch("round(x, 0.5)", {"x": [1.25]})
+
+@pytest.mark.parametrize("expression", [
+    "9 ** 9 ** 9",
+    "2 ** 100000",
+    "(10 ** 1000) * (10 ** 1000)",
+    "10.0 ** 400",
+    "exp(100000)",
+    "(-8) ** 0.5",
+    "sqrt(-1)",
+    "1 / 0",
+])
+def test_rejects_expensive_or_invalid_results(expression):
+    with pytest.raises(ExpressionError):
+        _fast(lambda: evaluate(expression))
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os')",
+    "(1).__class__",
+    "[1, 2]",
+    "lambda: 1",
+    "open('x')",
+    "x if 1 else 2",
+    "max(1, key=abs)",
+    "1 +" * 300 + "1",
+    "1" * 2000,
+])
+def test_rejects_unsupported_syntax(expression):
+    with pytest.raises(ExpressionError):
+        evaluate(expression, {"x": 1})
+
+def test_batch_min_max_take_every_argument():
+    z = np.array([0.0, 0.0, 9.0])
+    result = evaluate_batch("max(x, y, z)", {"x": [1.0, 5.0, 2.0], "y": [3.0, 1.0, 1.0], "z": z})
+    assert result.tolist() == [3.0, 5.0, 9.0]
+    assert z.tolist() == [0.0, 0.0, 9.0]
+    assert evaluate_batch("max(x, 2, 0)", {"x": [1.0, 3.0]}).tolist() == [2.0, 3.0]
+
+def test_batch_rejects_broadcasting():
+    with pytest.raises(ExpressionError):
+        evaluate_batch("x * y", {"x": np.ones((6000, 1)), "y": np.ones((1, 6000))})
+    with pytest.raises(ExpressionError):
+        evaluate_batch("x * y", {"x": [1.0, 2.0], "y": [1.0, 2.0, 3.0]})
+    assert evaluate_batch("x * y", {"x": [1.0, 2.0], "y": 3}).tolist() == [3.0, 6.0]
@@ -0,0 +1,15 @@
+from memory_store import BoundedMemoryStore
+
+def test_heaps_stay_bounded_under_eviction():
+    store = BoundedMemoryStore(100)
+    for i in range(200_000):
+        store.add(None, (i % 97) / 97, float(i))
+    assert len(store) == 100
+    assert len(store._min_heap) <= 2 * 100 + 64
+    assert len(store._max_heap) <= 2 * 100 + 64
+
+def test_top_k_after_eviction():
+    store = BoundedMemoryStore(10)
+    for i in range(1000):
+        store.add(i, i / 1000, float(i))
+    assert [item_id for item_id, _ in store.top_k(3)] == [999, 998, 997]
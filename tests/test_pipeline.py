@@ -0,0 +1,19 @@
+import asyncio
+
+from pipeline import Stage, StageGraph
+from telemetry import metrics
+
+def test_background_stage_failures_are_counted():
+    def fail(_):
+        raise RuntimeError("boom")
+
+    async def run():
+        graph = StageGraph([Stage("main", lambda _: 1), Stage("side", fail, deps=["main"], critical=False)])
+        results, _, background = await graph.run()
+        await asyncio.wait(background)
+        # Done callbacks run on the next loop iteration
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(run()) == {"main": 1}
+    assert 'background_task_errors_total{task="side"} 1' in metrics.render_prometheus()
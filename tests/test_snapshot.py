@@ -0,0 +1,33 @@
+import zlib
+
+import pytest
+
+import snapshot
+from main import CognitiveAgent
+from snapshot import MAGIC, SnapshotError, _HEADER, restore_agent
+
+def _frame(payload, kind=snapshot.FULL, sequence=1, base_sequence=0):
+    return _HEADER.pack(MAGIC, snapshot.SNAPSHOT_VERSION, kind, 7, sequence, base_sequence,
+                        zlib.crc32(payload), len(payload)) + payload
+
+def test_payload_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(snapshot, "MAX_PAYLOAD_BYTES", 1024)
+    with pytest.raises(SnapshotError, match="exceeds"):
+        restore_agent(_frame(zlib.compress(b"\0" * 1_000_000)))
+
+def test_corrupt_zlib_is_a_snapshot_error():
+    with pytest.raises(SnapshotError):
+        restore_agent(_frame(b"not zlib at all"))
+    with pytest.raises(SnapshotError):
+        restore_agent(_frame(zlib.compress(b"a" * 100)[:-4]))
+
+def test_duplicate_ids_in_delta_are_a_snapshot_error():
+    agent = CognitiveAgent()
+    agent.memory._insert("hello world", {}, 0.5, 1.0)
+    full = agent.snapshot(True)
+    restored = restore_agent(full)
+    _, _, _, session_id, sequence, _, crc, length = _HEADER.unpack_from(full)
+    delta = _HEADER.pack(MAGIC, snapshot.SNAPSHOT_VERSION, snapshot.DELTA, session_id,
+                         sequence + 1, sequence, crc, length) + full[_HEADER.size:]
+    with pytest.raises(SnapshotError, match="already stored"):
+        restore_agent(delta, agent=restored)